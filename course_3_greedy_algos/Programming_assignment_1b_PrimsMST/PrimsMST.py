@@ -7,8 +7,12 @@ achieve O(mlog(n)) running time.
 """
 
 import time
+import numpy as np
 from data_structures import graphs, union_find, heap
 
+# Filter-Kruskal sorts and walks edge blocks of at most this size directly, partitioning larger ones
+FILTER_BASE = 1 << 14
+
 
 def read_file(src: str):
     """
@@ -77,6 +81,78 @@ def prims_mst(graph_in: graphs.Graph):
                     h.insert(add_weight, (nxt, add))
     return tree_out
 
+def edges_to_csr(edges):
+    """
+    Build compressed sparse row adjacency arrays for an undirected graph given as an edge array. Each edge appears
+    once in the adjacency of both its endpoints.
+
+    Args:
+        edges: 2D np.array, one edge per row as start, end, cost
+
+    Returns:
+        verts: np.array, original vertex label of each dense vertex id
+        indptr: np.array, neighbors of vertex v are indices[indptr[v]:indptr[v + 1]]
+        indices: np.array, neighbor of each adjacency entry
+        weights: np.array, cost of each adjacency entry
+        edge_ids: np.array, row in the edge array of each adjacency entry
+    """
+    edges = np.asarray(edges).reshape(-1, 3)
+    verts, ends = np.unique(edges[:, :2].astype(np.int64), return_inverse=True)
+    ends = ends.reshape(-1, 2)
+    m = len(edges)
+
+    src = np.concatenate((ends[:, 0], ends[:, 1]))
+    dst = np.concatenate((ends[:, 1], ends[:, 0]))
+    edge_ids = np.concatenate((np.arange(m), np.arange(m)))
+    order = np.argsort(src, kind="stable")
+
+    indptr = np.zeros(len(verts) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(src, minlength=len(verts)))
+    return verts, indptr, dst[order], np.concatenate((edges[:, 2], edges[:, 2]))[order], edge_ids[order]
+
+def prims_edges(edges):
+    """
+    Prim's algorithm over CSR adjacency arrays with an indexed heap. The heap holds at most one entry per vertex
+    outside the tree, keyed by its cheapest edge into the tree, and keys are decreased in place as the tree grows.
+    Heap size is thus O(n) and running time O(mlog(n)). Spanning progress is a counter of vertices added.
+
+    Args:
+        edges: 2D np.array, one edge per row as start, end, cost
+
+    Returns:
+        mst_idx: np.array of int, indices of the MST edges in the input array, in order of addition
+        cost: total cost of the MST
+    """
+    verts, indptr, indices, weights, edge_ids = edges_to_csr(edges)
+    indptr, indices, weights, edge_ids = indptr.tolist(), indices.tolist(), weights.tolist(), edge_ids.tolist()
+    n = len(verts)
+
+    in_tree = [False] * n
+    best_edge = [-1] * n
+    h = heap.IndexedMinHeap(n)
+    if n:
+        h.decrease_key(0, 0)
+
+    cost = 0
+    added = 0
+    mst_idx = []
+    while added < n and h.heap_size:
+        # Cheapest vertex to connect to the tree
+        weight, v = h.pop_root()
+        in_tree[v] = True
+        added += 1
+        if best_edge[v] >= 0:
+            cost += weight
+            mst_idx.append(best_edge[v])
+
+        # Update the best edge into the tree for the frontier vertices
+        for e in range(indptr[v], indptr[v + 1]):
+            u = indices[e]
+            if not in_tree[u] and h.decrease_key(weights[e], u):
+                best_edge[u] = edge_ids[e]
+
+    return np.array(mst_idx, dtype=np.int64), cost
+
 def kruskal_mst(graph_in: graphs.Graph):
     """
     Compute the minimum spanning tree (MST) for an input undirected graph using Kruskal's greedy algo
@@ -85,34 +161,145 @@ def kruskal_mst(graph_in: graphs.Graph):
     MST if its addition does not result in a directed cycle.
 
     Deploying the UF data structure allows for "blazingly fast" checks for these cycles, speeding things
-    up from an O(n^2) running time to O(mlog(n)).
+    up from an O(n^2) running time to O(mlog(n)). The work is done by kruskal_edges over the graph's edge list.
     """
+    _, _, tree_out = kruskal_edges(np.array(graph_in.edges), build_tree=True)
+    return tree_out
 
-    # Get a list of edges and sort
-    edges = sorted(graph_in.edges, key= lambda x: x[2])
+def kruskal_edges(edges, build_tree: bool = False):
+    """
+    Kruskal's algorithm over an edge array. Edges are argsorted by cost once and walked in order by the bulk
+    union of a dense, array-backed union-find, which stops as soon as n - 1 edges have been accepted.
 
-    # Use a graph object for the MST
-    tree_out = graphs.Graph()
+    Args:
+        edges: 2D np.array, one edge per row as start, end, cost
+        build_tree: bool, also build a Graph object for the MST. Optional, default False
+
+    Returns:
+        mst_idx: np.array of int, indices of the MST edges in the input array, in order of acceptance
+        cost: total cost of the MST
+        tree_out: Graph object for the MST, None unless build_tree
+    """
+    edges = np.asarray(edges).reshape(-1, 3)
+    order = np.argsort(edges[:, 2], kind="stable")
+
+    # Vertices labelled densely for the union-find
+    verts, ends = np.unique(edges[:, :2].astype(np.int64), return_inverse=True)
+    ends = ends.reshape(-1, 2)
+    mst_uf = union_find.DenseUnionFind(len(verts))
 
-    # Union-find object to accelerate Kruskal
-    mst_uf = union_find.UnionFind()
-    for m1, m2, _ in edges:
-        mst_uf.add_member(m1)
-        mst_uf.add_member(m2)
+    accepted, _ = mst_uf.union_edges(ends[order], stop_at_components=1)
+    mst_idx = order[accepted]
+    cost = edges[mst_idx, 2].sum()
 
-    # Continue merging parents until we span the graph
-    while len(set(mst_uf.parents.values())) > 1:
-        # Take the cheapest edge
-        if len(edges) < 1:
+    tree_out = None
+    if build_tree:
+        tree_out = graphs.Graph()
+        for start, end, weight in edges[mst_idx].tolist():
+            tree_out.add_edge(start, end, weight)
+    return mst_idx, cost, tree_out
+
+
+def boruvka_edges(edges):
+    """
+    Borůvka's algorithm over an edge array. Each round finds the cheapest edge leaving every component with a
+    vectorized minimum over the edge arrays, adds all of them to the MST and contracts the components with a dense
+    union-find. Edges inside a component are dropped as the rounds go. The number of components at least halves per
+    round, so there are at most log(n) rounds of O(m) array work each.
+
+    Ties on cost are broken by rank in a stable sort of the edges, so the cheapest edges chosen in a round never
+    close a cycle.
+
+    Args:
+        edges: 2D np.array, one edge per row as start, end, cost
+
+    Returns:
+        mst_idx: np.array of int, indices of the MST edges in the input array, in order of acceptance
+        cost: total cost of the MST
+    """
+    edges = np.asarray(edges).reshape(-1, 3)
+    m = len(edges)
+    order = np.argsort(edges[:, 2], kind="stable")
+    rank = np.empty(m, dtype=np.int64)
+    rank[order] = np.arange(m)
+
+    verts, ends = np.unique(edges[:, :2].astype(np.int64), return_inverse=True)
+    ends = ends.reshape(-1, 2)
+    n = len(verts)
+    mst_uf = union_find.DenseUnionFind(n)
+
+    active = np.arange(m)
+    mst_idx = []
+    while mst_uf.num_components > 1:
+        # Drop the edges inside a component
+        cu = mst_uf.find_many(ends[active, 0])
+        cv = mst_uf.find_many(ends[active, 1])
+        crossing = cu != cv
+        active, cu, cv = active[crossing], cu[crossing], cv[crossing]
+        if not len(active):
             break
-        start, end, cost = edges.pop(0)
-        # If the edge connects distinct subtrees, and thus doesn't induce a cycle, add it to the MST
-        if mst_uf.find(start) != mst_uf.find(end):
-            tree_out.add_edge(start, end, cost)
-            # Update the union-find
-            mst_uf.union(start, end)
 
-    return tree_out
+        # Lowest ranked edge leaving each component
+        best = np.full(n, m, dtype=np.int64)
+        np.minimum.at(best, cu, rank[active])
+        np.minimum.at(best, cv, rank[active])
+        chosen = order[np.unique(best[best < m])]
+
+        # Contract along the chosen edges, which form a forest over the components
+        accepted, _ = mst_uf.union_edges(ends[chosen], stop_at_components=1)
+        mst_idx.append(chosen[accepted])
+
+    mst_idx = np.concatenate(mst_idx) if mst_idx else np.zeros(0, dtype=np.int64)
+    return mst_idx, edges[mst_idx, 2].sum()
+
+def filter_kruskal_edges(edges, base: int = FILTER_BASE):
+    """
+    Filter-Kruskal over an edge array. Blocks of edges are partitioned around a pivot cost and the light side is
+    handled first. Before a heavy block is touched, edges whose endpoints are already connected are filtered out with
+    a vectorized find, so most heavy edges are never sorted. Blocks of at most base edges are sorted and walked by the
+    bulk union of a dense union-find, as in kruskal_edges.
+
+    Args:
+        edges: 2D np.array, one edge per row as start, end, cost
+        base: int, largest block sorted directly. Optional, default FILTER_BASE
+
+    Returns:
+        mst_idx: np.array of int, indices of the MST edges in the input array, in order of acceptance
+        cost: total cost of the MST
+    """
+    edges = np.asarray(edges).reshape(-1, 3)
+    weights = edges[:, 2]
+    verts, ends = np.unique(edges[:, :2].astype(np.int64), return_inverse=True)
+    ends = ends.reshape(-1, 2)
+    mst_uf = union_find.DenseUnionFind(len(verts))
+
+    # Stack of edge blocks, the lightest on top
+    stack = [np.arange(len(edges))]
+    mst_idx = []
+    while stack and mst_uf.num_components > 1:
+        block = stack.pop()
+
+        # Filter out the edges inside a component
+        block = block[mst_uf.find_many(ends[block, 0]) != mst_uf.find_many(ends[block, 1])]
+        if not len(block):
+            continue
+
+        w = weights[block]
+        lo, hi = w.min(), w.max()
+        if len(block) <= base or lo == hi:
+            block = block[np.argsort(w, kind="stable")]
+            accepted, _ = mst_uf.union_edges(ends[block], stop_at_components=1)
+            mst_idx.append(block[accepted])
+            continue
+
+        # Partition around the median cost of a sample, keeping both sides non-empty
+        pivot = np.median(w[np.linspace(0, len(w) - 1, 255).astype(np.int64)])
+        light = w <= pivot if pivot < hi else w < pivot
+        stack.append(block[~light])
+        stack.append(block[light])
+
+    mst_idx = np.concatenate(mst_idx) if mst_idx else np.zeros(0, dtype=np.int64)
+    return mst_idx, edges[mst_idx, 2].sum()
 
 
 
@@ -143,3 +330,39 @@ if __name__ == "__main__":
 
     print("Kruskal's MST ran in", time.time() - begin, "seconds")
     print("MST cost:", mst_kruskal.edge_sum)
+
+    # Timing
+    begin = time.time()
+
+    # Compute MST once more, with Kruskal's algorithm straight over the edge array
+    _, kruskal_cost, _ = kruskal_edges(np.array(read_file(source)))
+
+    print("Kruskal's MST over edge arrays ran in", time.time() - begin, "seconds")
+    print("MST cost:", kruskal_cost)
+
+    # Timing
+    begin = time.time()
+
+    # And with Prim's algorithm over CSR adjacency arrays, using an indexed heap
+    _, prims_cost = prims_edges(np.array(read_file(source)))
+
+    print("Prim's MST over CSR arrays ran in", time.time() - begin, "seconds")
+    print("MST cost:", prims_cost)
+
+    # Timing
+    begin = time.time()
+
+    # Borůvka's algorithm, with vectorized cheapest-edge rounds
+    _, boruvka_cost = boruvka_edges(np.array(read_file(source)))
+
+    print("Boruvka's MST ran in", time.time() - begin, "seconds")
+    print("MST cost:", boruvka_cost)
+
+    # Timing
+    begin = time.time()
+
+    # Filter-Kruskal, discarding edges inside components before sorting them
+    _, filter_cost = filter_kruskal_edges(np.array(read_file(source)))
+
+    print("Filter-Kruskal MST ran in", time.time() - begin, "seconds")
+    print("MST cost:", filter_cost)
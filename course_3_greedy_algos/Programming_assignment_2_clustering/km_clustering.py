@@ -12,6 +12,7 @@
 """
 
 import time
+import numpy as np
 from data_structures import union_find
 
 def read_graph(src: str):
@@ -28,10 +29,63 @@ def read_graph(src: str):
             edges.append([int(i) for i in line.split()])
     return edges
 
+class SingleLinkage:
+    """
+    Single-linkage clustering engine. Kruskal's algorithm is run once over the whole graph, recording the cost of
+    every merge, which gives the single-linkage dendrogram. Any number of clusters k can then be read off it: the
+    k-clustering is the state after the first n - k merges, and its maximum spacing is the cost of the next merge.
+    """
+    def __init__(self, graph_in: list):
+        """
+        Constructor
+        Args:
+            graph_in: list or 2D np.array, weight adjacency list for the input graph
+        """
+        # Edge array, sorted by increasing distance
+        edges = np.asarray(graph_in).reshape(-1, 3)
+        edges = edges[np.argsort(edges[:, 2], kind="stable")]
+
+        # Members labelled densely for the union-find
+        self.members, ends = np.unique(edges[:, :2].astype(np.int64), return_inverse=True)
+        ends = ends.reshape(-1, 2)
+        uf = union_find.DenseUnionFind(len(self.members))
+
+        # Merge order, as the edges accepted by Kruskal's algorithm, and the cost of each merge
+        accepted, _ = uf.union_edges(ends, stop_at_components=1)
+        self.merge_ends = ends[accepted]
+        self.merge_costs = edges[accepted, 2]
+
+    def max_spacing(self, k: int):
+        """
+        Maximum spacing of the k-clustering, in O(1)
+        Args:
+            k: int, number of clusters
+
+        Returns: the shortest edge between two of the k clusters. False if no clustering possible.
+        """
+        step = max(len(self.members) - k, 0)
+        if step >= len(self.merge_costs):
+            return False
+        return self.merge_costs[step]
+
+    def labels(self, k: int):
+        """
+        Cluster of every member in the k-clustering, in O(n), by replaying the first n - k merges
+        Args:
+            k: int, number of clusters
+
+        Returns: np.array of int, cluster 0..k-1 of each member, in the order of self.members
+        """
+        uf = union_find.DenseUnionFind(len(self.members))
+        uf.union_edges(self.merge_ends[:max(len(self.members) - k, 0)], stop_at_components=1)
+        _, labels = np.unique(uf.labels(), return_inverse=True)
+        return labels
+
 def km_cluster(graph_in: list, num_clusters: int):
     """
     Conduct k-means clustering of an input graph formatted as an adjacency list using Kruskal's algorithm
-    implemented with a union-find data structure. Returns the maximum spacing for the resulting clustering
+    implemented with a union-find data structure. Returns the maximum spacing for the resulting clustering.
+    To sweep many numbers of clusters, build a SingleLinkage once and query it instead.
     Args:
         graph_in: list, weight adjacency list for the input graph
         num_clusters: number of clusters to compute
@@ -39,35 +93,7 @@ def km_cluster(graph_in: list, num_clusters: int):
     Returns: maximum spacing from the resulting clustering. False if no clustering possible.
 
     """
-    # Get a list of edges, sorted by increasing distance
-    edges = sorted(graph_in, key= lambda x: x[2])
-
-    # Setup union-find
-    uf = union_find.UnionFind()
-    for m1, m2, _ in edges:
-        uf.add_member(m1)
-        uf.add_member(m2)
-
-    # Keep track of the number of merges
-    merges = 0
-
-    while merges < len(uf.ids) - num_clusters:
-        # Pop lowest remaining distance
-        start, end, distance = edges.pop(0)
-
-        # If the edge isn't from within a cluster, merge the clusters
-        if uf.find(start) != uf.find(end):
-            uf.union(start, end)
-            merges += 1
-
-    # Get the maximum spacing from the remaining edges
-    while len(edges) > 0:
-        start, end, spacing = edges.pop(0)
-        if uf.find(start) != uf.find(end):
-            return spacing
-
-    # Return false if there is no max spacing
-    return False
+    return SingleLinkage(graph_in).max_spacing(num_clusters)
 
 if __name__ == "__main__":
 
@@ -84,4 +110,14 @@ if __name__ == "__main__":
     max_spacing = km_cluster(input_adj_list, 4)
 
     print("KM clustering ran in", time.time() - begin, "seconds")
-    print("Max spacing:", max_spacing)
\ No newline at end of file
+    print("Max spacing:", max_spacing)
+
+    # Timing
+    begin = time.time()
+
+    # Sweep the number of clusters, from one pass of Kruskal's algorithm
+    engine = SingleLinkage(input_adj_list)
+    spacings = [engine.max_spacing(k) for k in range(2, len(engine.members) + 1)]
+
+    print("Single-linkage sweep over", len(spacings), "values of k ran in", time.time() - begin, "seconds")
+    print("Max spacing for 4 clusters:", spacings[2])
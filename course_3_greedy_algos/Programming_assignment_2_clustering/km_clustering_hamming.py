@@ -7,12 +7,19 @@ Implementation makes use of the union-find data structure, with lazy union-by-ra
 """
 
 import time
+import numpy as np
 from data_structures import union_find
 import itertools
 
 # Minimum spacing to compute the max number of clusters for
 MIN_SPACE = 3
 
+# Approximate number of bytes of text parsed per chunk when streaming codes from file
+CHUNK_BYTES = 1 << 22
+
+# Number of set bits in each byte value
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
 def read_hamming_graph(src: str):
     """
     Helper function to read in the graph. Input a text file. The first row is two numbers, the
@@ -32,6 +39,43 @@ def read_hamming_graph(src: str):
             i += 1
     return nodes
 
+def read_hamming_codes(src: str, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Stream the input file in chunks of lines, packing each row of bits into an integer code. Each chunk is parsed
+    in one vectorized pass over its bytes, and duplicate codes are merged on the fly with a count of each, so memory
+    is proportional to the number of unique codes rather than the lines of text.
+    Args:
+        src: file path for the input file
+        chunk_bytes: int, approximate size of each chunk read. Optional, default CHUNK_BYTES
+
+    Returns:
+        codes: np.array of unsigned int, sorted unique codes, uint32 for up to 32 bits and uint64 beyond
+        counts: np.array of int, number of members at each code
+        bits: int, number of bits per code
+    """
+    with open(src, "rb") as file:
+        bits = int(file.readline().split()[1])
+        dtype = np.uint32 if bits <= 32 else np.uint64
+        # Value of each bit position, most significant first
+        weights = (np.uint64(1) << np.arange(bits - 1, -1, -1, dtype=np.uint64)).astype(dtype)
+
+        codes = np.zeros(0, dtype=dtype)
+        counts = np.zeros(0, dtype=np.int64)
+        while True:
+            lines = file.readlines(chunk_bytes)
+            if not lines:
+                break
+            # Keep only the digits, one row of bits per member
+            buf = np.frombuffer(b"".join(lines), dtype=np.uint8)
+            digits = buf[(buf == ord("0")) | (buf == ord("1"))] - ord("0")
+            chunk = (digits.reshape(-1, bits).astype(dtype) * weights).sum(axis=1, dtype=dtype)
+
+            # Merge into the running unique codes and counts
+            chunk, chunk_counts = np.unique(chunk, return_counts=True)
+            codes, inverse = np.unique(np.concatenate((codes, chunk)), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate((counts, chunk_counts))).astype(np.int64)
+    return codes, counts, bits
+
 def generate_neighborhood(member_dict: dict, home: str, ndh_hd: int = 1):
     """
     Create a neighbourhood around a home member of a specified hamming distance size
@@ -65,8 +109,191 @@ def generate_neighborhood(member_dict: dict, home: str, ndh_hd: int = 1):
                 neighborhood.append("".join(add))
     return neighborhood
 
+def flip_masks(bits: int, ndh_hd: int = 1):
+    """
+    Integer masks flipping every combination of up to ndh_hd bits of a code, computed once and reused for all members
+    Args:
+        bits: int, number of bits per code
+        ndh_hd: neighbourhood Hamming distance, optional, default 1 bit
+
+    Returns:
+        masks: list of int, one mask per combination of flipped bits
+    """
+    masks = []
+    for i in range(1, ndh_hd + 1):
+        for comb in itertools.combinations(range(bits), i):
+            masks.append(sum(1 << j for j in comb))
+    return masks
+
+def generate_neighborhood_int(member_ids: dict, home: int, masks: list):
+    """
+    Integer-encoded counterpart of generate_neighborhood. Neighbors are found by XOR of the home code against
+    precomputed flip masks.
+    Args:
+        member_ids: dictionary mapping each member's integer code to its label
+        home: int, code of the home member
+        masks: list of int, flip masks from flip_masks
+
+    Returns:
+        neighborhood: list of labels of the neighbours around home within the masks' Hamming distance
+    """
+    neighborhood = []
+    for mask in masks:
+        add = home ^ mask
+        if add in member_ids:
+            neighborhood.append(member_ids[add])
+    return neighborhood
+
+def max_clusters_hamming_int(members_in: list, min_spacing: int = 3):
+    """
+    Integer-encoded mode of max_clusters_hamming. Each binary string is parsed into an int once, and the flip masks
+    for the neighbourhood are built once. Neighbor pairs found by XOR are then merged in bulk by an array-backed
+    union-find over the unique codes.
+    Args:
+        members_in: list of binary strings giving each member's location
+        min_spacing: minimum difference between all pairs between all clusters
+
+    Returns:
+        int, number of clusters required to achieve the passed minimum spacing
+    """
+    # Unique integer codes, each labelled densely
+    member_ids = {}
+    for member in members_in:
+        member_ids.setdefault(int(member, 2), len(member_ids))
+    if not member_ids:
+        return 0
+    masks = flip_masks(len(members_in[0]), min_spacing - 1)
+
+    # Pairs of members within the neighbourhood, each pair found from its lower labelled end
+    pairs = []
+    for code, label in member_ids.items():
+        for n in generate_neighborhood_int(member_ids, code, masks):
+            if label < n:
+                pairs.append((label, n))
 
-def max_clusters_hamming(members_in: list, min_spacing: int = 3):
+    uf = union_find.DenseUnionFind(len(member_ids))
+    if pairs:
+        uf.union_edges(np.array(pairs, dtype=np.int64))
+    return uf.num_components
+
+def hamming_codes(members_in: list):
+    """
+    Pack binary strings into an array of unsigned integer codes, uint32 for up to 32 bits and uint64 beyond
+    Args:
+        members_in: list of binary strings giving each member's location
+
+    Returns:
+        codes: np.array of the integer code of each member
+    """
+    bits = len(members_in[0]) if members_in else 0
+    dtype = np.uint32 if bits <= 32 else np.uint64
+    return np.fromiter((int(member, 2) for member in members_in), dtype=dtype, count=len(members_in))
+
+def cluster_codes(codes, bits: int, min_spacing: int = 3):
+    """
+    Number of clusters keeping a minimum Hamming spacing over an array of integer codes, in vectorized passes.
+    Duplicate codes are merged up front. For every flip mask, the whole array of unique codes is XORed with the mask
+    and the results are looked up with a binary search against the sorted codes. The (i, j) hits are then merged in
+    one pass by an array-backed union-find.
+    Args:
+        codes: np.array of unsigned int, code of each member, duplicates allowed
+        bits: int, number of bits per code
+        min_spacing: minimum difference between all pairs between all clusters
+
+    Returns:
+        int, number of clusters required to achieve the passed minimum spacing
+    """
+    uniq = np.unique(codes)
+    uf = union_find.DenseUnionFind(len(uniq))
+    if len(uniq) < 2:
+        return uf.num_components
+
+    pairs_i, pairs_j = [], []
+    for mask in flip_masks(bits, min_spacing - 1):
+        target = uniq ^ uniq.dtype.type(mask)
+        pos = np.searchsorted(uniq, target)
+        pos[pos == len(uniq)] = 0
+        i = np.flatnonzero(uniq[pos] == target)
+        j = pos[i]
+
+        # Each pair once, from its lower end
+        pairs_i.append(i[i < j])
+        pairs_j.append(j[i < j])
+
+    # Merge all the pairs in one bulk pass
+    if pairs_i:
+        uf.union_edges(np.column_stack((np.concatenate(pairs_i), np.concatenate(pairs_j))))
+    return uf.num_components
+
+def popcount(x):
+    """
+    Number of set bits in each entry of an array of codes. Uses np.bitwise_count where NumPy provides it, else a
+    byte table lookup.
+    Args:
+        x: np.array of unsigned int of at most 64 bits
+
+    Returns:
+        np.array of int, set bits per entry
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    x = np.ascontiguousarray(x, dtype=np.uint64)
+    return POPCOUNT_TABLE[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+def cluster_codes_mih(codes, bits: int, min_spacing: int = 3):
+    """
+    Number of clusters keeping a minimum Hamming spacing over an array of integer codes of up to 64 bits, by
+    multi-index hashing. Members closer than min_spacing differ in at most r = min_spacing - 1 bits, so splitting the
+    codes into r + 1 substrings, by the pigeonhole principle such pairs match exactly on at least one substring.
+    For each substring the unique codes are sorted on it, candidates are the pairs inside runs of equal substrings,
+    and they are verified with a popcount of their XOR. Work scales with the candidates rather than the C(b, r) flip
+    masks, so larger spacings and wider codes stay practical.
+    Args:
+        codes: np.array of unsigned int, code of each member, duplicates allowed
+        bits: int, number of bits per code, at most 64
+        min_spacing: minimum difference between all pairs between all clusters
+
+    Returns:
+        int, number of clusters required to achieve the passed minimum spacing
+    """
+    uniq = np.unique(codes).astype(np.uint64)
+    n = len(uniq)
+    uf = union_find.DenseUnionFind(n)
+    if n < 2:
+        return uf.num_components
+    r = min_spacing - 1
+
+    pairs_i, pairs_j = [], []
+    for part in np.array_split(np.arange(bits), r + 1):
+        # Substring of the codes, an empty one putting every code in a single run
+        off = int(part[0]) if len(part) else 0
+        key = (uniq >> np.uint64(off)) & np.uint64((1 << len(part)) - 1)
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+
+        # End of the run of equal substrings holding each sorted position
+        starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        lengths = np.diff(np.append(starts, n))
+        end = np.repeat(starts + lengths, lengths)
+
+        # Pairs d apart within a run, tracking the positions whose run still extends d ahead
+        live = np.arange(n)
+        d = 1
+        while True:
+            live = live[live + d < end[live]]
+            if not len(live):
+                break
+            i, j = order[live], order[live + d]
+            close = popcount(uniq[i] ^ uniq[j]) <= r
+            pairs_i.append(i[close])
+            pairs_j.append(j[close])
+            d += 1
+
+    if pairs_i:
+        uf.union_edges(np.column_stack((np.concatenate(pairs_i), np.concatenate(pairs_j))))
+    return uf.num_components
+
+def max_clusters_hamming(members_in: list, min_spacing: int = 3, mode: str = "str"):
     """
     Computes the maximum number of clusters in a graph that will preserve a passed minimum
     spacing between clusters. Employs a distributed greedy approach and union-find data structure.
@@ -77,10 +304,23 @@ def max_clusters_hamming(members_in: list, min_spacing: int = 3):
     Args:
         members_in: list of binary strings giving each member's location
         min_spacing: minimum difference between all pairs between all clusters
+        mode: str, "str" to flip bits of the strings, "int" for integer codes with XOR masks, "batch" for vectorized
+            passes over an array of codes, "mih" for multi-index hashing. Optional, default "str"
 
     Returns:
         int, number of clusters required to achieve the passed minimum spacing
     """
+    if mode == "int":
+        return max_clusters_hamming_int(members_in, min_spacing)
+    if mode == "batch":
+        if not members_in:
+            return 0
+        return cluster_codes(hamming_codes(members_in), len(members_in[0]), min_spacing)
+    if mode == "mih":
+        if not members_in:
+            return 0
+        return cluster_codes_mih(hamming_codes(members_in), len(members_in[0]), min_spacing)
+
     # Generate a copy of the graph to allow mutation
     members = members_in.copy()
 
@@ -97,12 +337,8 @@ def max_clusters_hamming(members_in: list, min_spacing: int = 3):
         for n in nbh:
             if uf.find(n) != uf.find(m):
                 uf.union(m, n)
-    # Enforce path compression
-    for m in uf.parents:
-        uf.parents[m] = uf.find(m)
-
     # Return the number of clusters
-    return len(set(uf.parents.values()))
+    return uf.num_components
 
 if __name__ == "__main__":
 
@@ -119,4 +355,42 @@ if __name__ == "__main__":
     max_k = max_clusters_hamming(hamming_list_in, min_spacing=MIN_SPACE)
 
     print("KM clustering ran in", time.time() - begin, "seconds")
-    print("The max number of clusters is", max_k, "for a minimum spacing of H = ", MIN_SPACE)
\ No newline at end of file
+    print("The max number of clusters is", max_k, "for a minimum spacing of H = ", MIN_SPACE)
+
+    # Timing
+    begin = time.time()
+
+    # Again, with integer codes and XOR flip masks
+    max_k = max_clusters_hamming(hamming_list_in, min_spacing=MIN_SPACE, mode="int")
+
+    print("KM clustering with integer codes ran in", time.time() - begin, "seconds")
+    print("The max number of clusters is", max_k, "for a minimum spacing of H = ", MIN_SPACE)
+
+    # Timing
+    begin = time.time()
+
+    # And in vectorized passes over an array of codes, one per flip mask
+    max_k = max_clusters_hamming(hamming_list_in, min_spacing=MIN_SPACE, mode="batch")
+
+    print("KM clustering in vectorized batches ran in", time.time() - begin, "seconds")
+    print("The max number of clusters is", max_k, "for a minimum spacing of H = ", MIN_SPACE)
+
+    # Timing
+    begin = time.time()
+
+    # And by multi-index hashing on substrings of the codes
+    max_k = max_clusters_hamming(hamming_list_in, min_spacing=MIN_SPACE, mode="mih")
+
+    print("KM clustering by multi-index hashing ran in", time.time() - begin, "seconds")
+    print("The max number of clusters is", max_k, "for a minimum spacing of H = ", MIN_SPACE)
+
+    # Timing
+    begin = time.time()
+
+    # Streaming the file straight into unique integer codes, then clustering in vectorized batches
+    codes, counts, bits = read_hamming_codes(source)
+    max_k = cluster_codes(codes, bits, min_spacing=MIN_SPACE)
+
+    print("Streaming ingestion and KM clustering ran in", time.time() - begin, "seconds")
+    print(len(codes), "unique codes from", counts.sum(), "members")
+    print("The max number of clusters is", max_k, "for a minimum spacing of H = ", MIN_SPACE)
@@ -5,8 +5,15 @@ Completed for programming assignment 3 of course 3 of the Coursera algorithms
 specialization by Tim Roughgarden
 """
 
+import os
+import tempfile
 import time
+import numpy as np
 from data_structures import huffman as hf
+from data_structures import huffman_codec
+
+# Maximum code length for the length-limited codes
+MAX_LEN = 12
 
 
 def read_input(src : str):
@@ -52,6 +59,23 @@ def huffman_encode(weights: list, use_queue: bool=False):
 
     return leaf_codes
 
+def huffman_code_lengths(weights: list, max_len: int = None):
+    """
+    Huffman code length for each symbol, from the linear two-queue builder over arrays. With a maximum length, codes
+    too long for it are replaced by the optimal length-limited ones from package-merge.
+    Args:
+        weights: list, entry i is the weight / frequency of symbol i
+        max_len: int, maximum code length. Optional, default None for no limit
+
+    Returns: np.array of int, entry i is the code length for symbol i
+    """
+    if len(weights) == 0:
+        return np.zeros(0, dtype=np.int64)
+    lengths = hf.merge_depths(*hf.two_queue_merge(weights))
+    if max_len is not None and lengths.max() > max_len:
+        lengths = hf.package_merge(weights, max_len)
+    return lengths
+
 
 if __name__ == "__main__":
 
@@ -79,4 +103,58 @@ if __name__ == "__main__":
 
     print("Huffman coding ran in", time.time() - begin, "seconds using regular queues")
     print("Max code length:", max([len(c) for c in codes.values()]))
-    print("Min code length:", min([len(c) for c in codes.values()]))
\ No newline at end of file
+    print("Min code length:", min([len(c) for c in codes.values()]))
+
+    # Timing
+    begin = time.time()
+
+    # And with the linear two-queue builder, straight to code lengths
+    lengths = huffman_code_lengths(W)
+
+    print("Huffman coding ran in", time.time() - begin, "seconds using the linear two-queue builder")
+    print("Max code length:", lengths.max())
+    print("Min code length:", lengths.min())
+
+    # Timing
+    begin = time.time()
+
+    # Length-limited codes, via package-merge
+    lengths = huffman_code_lengths(W, max_len=MAX_LEN)
+
+    print("Huffman coding ran in", time.time() - begin, "seconds limited to", MAX_LEN, "bits")
+    print("Max code length:", lengths.max())
+    print("Min code length:", lengths.min())
+
+    # Timing
+    begin = time.time()
+
+    # Compact array-backed tree with canonical codes, string codes only made on request
+    ht = hf.ArrayHuffmanTree(W)
+
+    print("Huffman coding ran in", time.time() - begin, "seconds using the array-backed tree")
+    print("Max code length:", ht.lengths.max())
+    print("Min code length:", ht.lengths.min())
+    print("Canonical code for symbol 0:", ht.code(0))
+
+    # Round trip through the bulk codec, in a temporary directory cleaned up afterwards
+    with tempfile.TemporaryDirectory() as tmp:
+        packed = os.path.join(tmp, "huffman.huf")
+        unpacked = os.path.join(tmp, "huffman.out")
+
+        # Timing
+        begin = time.time()
+
+        # Bulk codec, compressing the input file itself with table-driven canonical codes
+        size_in, size_out = huffman_codec.compress_file(source, packed)
+        elapsed = time.time() - begin
+
+        print("Compressed", size_in, "bytes to", size_out, "in", elapsed, "seconds,", size_in / 1e6 / elapsed, "MB/s")
+
+        # Timing
+        begin = time.time()
+
+        # And back again
+        huffman_codec.decompress_file(packed, unpacked)
+        elapsed = time.time() - begin
+
+        print("Decompressed", size_in, "bytes in", elapsed, "seconds,", size_in / 1e6 / elapsed, "MB/s")
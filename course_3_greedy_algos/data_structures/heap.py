@@ -135,3 +135,106 @@ class MinHeap:
         self.sift_down(1)
 
         return min_key, min_val
+
+
+class IndexedMinHeap:
+    """
+    Indexed min-heap over integer identifiers 0..n-1, holding at most one entry per identifier. The position of each
+    identifier in the heap is tracked, so its key can be decreased in place rather than inserting a duplicate.
+    Indexed from 1, as MinHeap.
+    """
+    def __init__(self, n: int):
+        """
+        Constructor
+        Args:
+            n: int, number of identifiers
+        """
+        self.heap_arr = [0]
+        self.val_arr = [-1]
+        # Position of each identifier in the heap arrays, 0 if absent
+        self.pos = [0] * n
+        self.heap_size = 0
+
+    def decrease_key(self, key, val: int):
+        """
+        Insert an identifier, or lower its key if it is already in the heap with a larger one
+        Args:
+            key: key for the heap entry, determines position in the heap
+            val: int, identifier tied to the key
+
+        Returns: bool, True if the heap was changed
+        """
+        i = self.pos[val]
+        if i == 0:
+            self.heap_arr.append(key)
+            self.val_arr.append(val)
+            self.heap_size += 1
+            i = self.heap_size
+        elif key < self.heap_arr[i]:
+            self.heap_arr[i] = key
+        else:
+            return False
+        self.sift_up(i)
+        return True
+
+    def sift_up(self, i: int):
+        """
+        Sift upwards from index i to maintain the heap, moving parents down into the hole
+        Args:
+            i: index in the heap array to sift upwards from
+
+        Returns:
+            None
+        """
+        key, val = self.heap_arr[i], self.val_arr[i]
+        while i > 1 and key < self.heap_arr[i // 2]:
+            pt = i // 2
+            self.heap_arr[i] = self.heap_arr[pt]
+            self.val_arr[i] = self.val_arr[pt]
+            self.pos[self.val_arr[i]] = i
+            i = pt
+        self.heap_arr[i], self.val_arr[i] = key, val
+        self.pos[val] = i
+        return None
+
+    def sift_down(self, i: int):
+        """
+        Sift downwards from index i to maintain the heap, moving smaller children up into the hole
+        Args:
+            i: index in the heap array to sift downwards from
+
+        Returns:
+            None
+        """
+        key, val = self.heap_arr[i], self.val_arr[i]
+        while 2 * i <= self.heap_size:
+            mc = 2 * i
+            if mc + 1 <= self.heap_size and self.heap_arr[mc + 1] < self.heap_arr[mc]:
+                mc += 1
+            if not self.heap_arr[mc] < key:
+                break
+            self.heap_arr[i] = self.heap_arr[mc]
+            self.val_arr[i] = self.val_arr[mc]
+            self.pos[self.val_arr[i]] = i
+            i = mc
+        self.heap_arr[i], self.val_arr[i] = key, val
+        self.pos[val] = i
+        return None
+
+    def pop_root(self):
+        """
+        Returns the minimum key and corresponding identifier of the heap, by definition the root.
+
+        Returns: (key, identifier) for the root
+        """
+        assert self.heap_size > 0, 'Empty heap!'
+        min_key, min_val = self.heap_arr[1], self.val_arr[1]
+        self.pos[min_val] = 0
+
+        # Move the end entry to the root and sift it down
+        last_key, last_val = self.heap_arr.pop(), self.val_arr.pop()
+        self.heap_size -= 1
+        if self.heap_size > 0:
+            self.heap_arr[1], self.val_arr[1] = last_key, last_val
+            self.sift_down(1)
+        return min_key, min_val
@@ -2,8 +2,13 @@
 Module for Huffman encoding. Includes class for nodes with useful attributes for the
 encoding procedure, and a separate class for maintaining a binary tree of these nodes.
 The tree also maintains a min-heap for accelerating the encoding procedure.
+
+two_queue_merge builds the same tree shape in linear time after a single sort of the weights, over plain arrays.
+ArrayHuffmanTree holds such a tree as int arrays, with code lengths computed iteratively and canonical codes
+assigned from the lengths. package_merge gives optimal code lengths under a maximum length.
 """
 
+import numpy as np
 from data_structures import heap
 
 class HuffmanNode:
@@ -160,4 +165,188 @@ class HuffmanTree:
             # If not, recurse on the left and right children, altering the code as need
             self.generate_codes(self.nodes[root_key].left_child, code=self.codes[root_key] + '0')
             self.generate_codes(self.nodes[root_key].right_child, code=self.codes[root_key] + '1')
-        return None
\ No newline at end of file
+        return None
+
+
+def two_queue_merge(weights):
+    """
+    Build a Huffman tree with the two-queue algorithm. The leaf weights are argsorted once, after which the first queue
+    is the sorted leaves and the second the merged nodes, created in non-decreasing weight order. Both queues are
+    preallocated arrays consumed by index pointers, so each merge is O(1) and the build is O(n) after the sort.
+    Leaves are ids 0..n-1, the symbol indices, and the merged node created at step k has id n + k.
+    Args:
+        weights: list or np.array, entry i is the weight / frequency of symbol i
+
+    Returns:
+        left: np.array of int, left child of merged node n + k at index k
+        right: np.array of int, right child of merged node n + k at index k, the lighter of the two
+    """
+    weights = np.asarray(weights)
+    n = len(weights)
+    order = np.argsort(weights, kind="stable")
+    leaf_ids = order.tolist()
+    leaf_w = weights[order].tolist()
+
+    merged_w = [0] * max(n - 1, 0)
+    left = [0] * max(n - 1, 0)
+    right = [0] * max(n - 1, 0)
+
+    # Heads of the leaf and merged queues. The merged queue's tail is k.
+    i = j = 0
+    for k in range(n - 1):
+        # Lightest front of the two queues, twice. Leaves win ties.
+        if j >= k or (i < n and leaf_w[i] <= merged_w[j]):
+            right_child, right_weight = leaf_ids[i], leaf_w[i]
+            i += 1
+        else:
+            right_child, right_weight = n + j, merged_w[j]
+            j += 1
+        if j >= k or (i < n and leaf_w[i] <= merged_w[j]):
+            left_child, left_weight = leaf_ids[i], leaf_w[i]
+            i += 1
+        else:
+            left_child, left_weight = n + j, merged_w[j]
+            j += 1
+
+        merged_w[k] = left_weight + right_weight
+        left[k] = left_child
+        right[k] = right_child
+    return np.array(left, dtype=np.int64), np.array(right, dtype=np.int64)
+
+def merge_depths(left, right):
+    """
+    Code length of every leaf of a tree from two_queue_merge. Merged nodes are visited from the root, the last one
+    created, down, so each node's depth is known before its children's.
+    Args:
+        left: np.array of int, left child of each merged node
+        right: np.array of int, right child of each merged node
+
+    Returns:
+        np.array of int, code length of symbol i at index i
+    """
+    n = len(left) + 1
+    left, right = left.tolist(), right.tolist()
+    depth = [0] * (2 * n - 1)
+    for k in range(n - 2, -1, -1):
+        d = depth[n + k] + 1
+        depth[left[k]] = d
+        depth[right[k]] = d
+    return np.array(depth[:n], dtype=np.int64)
+
+def package_merge(weights, max_len: int):
+    """
+    Optimal code lengths no longer than max_len, by the package-merge algorithm. Working up from the deepest level,
+    each level's list is the sorted leaves merged with packages, pairs of adjacent items from the level below. The
+    2n - 2 cheapest items of the top list are selected, and the packages among them expand to twice as many of the
+    cheapest items a level down. A symbol's code length is the number of levels where it is selected. Only the
+    running count of leaves in each merged list is kept, so the work is max_len vectorized passes over O(n) arrays.
+    Args:
+        weights: list or np.array, entry i is the weight / frequency of symbol i
+        max_len: int, maximum code length, with 2 ** max_len at least the number of symbols
+
+    Returns:
+        np.array of int, code length of symbol i at index i
+    """
+    weights = np.asarray(weights)
+    n = len(weights)
+    lengths = np.zeros(n, dtype=np.int64)
+    if n < 2:
+        return lengths
+    assert 2 ** max_len >= n, 'max_len too short for the number of symbols'
+
+    order = np.argsort(weights, kind="stable")
+    leaf_w = weights[order]
+
+    # Running count of leaves in each level's list, from the deepest level, which holds only the leaves
+    items = leaf_w
+    leaf_counts = [np.arange(n + 1)]
+    for _ in range(max_len - 1):
+        # Packages of adjacent pairs, merged with the leaves. Leaves come first on ties.
+        packages = items[:len(items) // 2 * 2].reshape(-1, 2).sum(axis=1)
+        merged = np.concatenate((leaf_w, packages))
+        ordering = np.argsort(merged, kind="stable")
+        items = merged[ordering]
+        leaf_counts.append(np.concatenate(([0], np.cumsum(ordering < n))))
+
+    # Select from the top level down. The cheapest leaves among the selected items each gain a bit.
+    change = np.zeros(n + 1, dtype=np.int64)
+    m = 2 * n - 2
+    for counts in reversed(leaf_counts):
+        c = counts[m]
+        change[0] += 1
+        change[c] -= 1
+        m = 2 * (m - c)
+    lengths[order] = np.cumsum(change[:n])
+    return lengths
+
+def canonical_codes(lengths):
+    """
+    Canonical Huffman codes for a set of code lengths. Symbols are ordered by length then index, and each takes the
+    next integer code, shifted left whenever the length grows. The code of a symbol is thus fixed by the lengths.
+    Args:
+        lengths: list or np.array of int, code length of symbol i at index i
+
+    Returns:
+        codes: list of int, code of symbol i at index i, read as its lengths[i] low bits
+    """
+    lengths = np.asarray(lengths)
+    codes = [0] * len(lengths)
+    code = 0
+    prev = 0
+    for s in np.lexsort((np.arange(len(lengths)), lengths)).tolist():
+        length = int(lengths[s])
+        code <<= length - prev
+        codes[s] = code
+        code += 1
+        prev = length
+    return codes
+
+class ArrayHuffmanTree:
+    """
+    Compact Huffman tree stored as int arrays rather than a node object per symbol. Leaves are ids 0..n-1, the symbol
+    indices, and merged nodes n..2n-2, with the root last.
+    Attributes:
+        num_leaves: int, number of symbols
+        left: np.array of int, left child of merged node n + k at index k
+        right: np.array of int, right child of merged node n + k at index k
+        parent: np.array of int, parent of every node, -1 for the root
+        root: int, id of the root
+        lengths: np.array of int, code length of each symbol
+        codes: list of int, canonical code of each symbol
+    """
+    def __init__(self, weights):
+        """
+        Constructor. Builds the tree with the two-queue algorithm and computes the code lengths and canonical codes.
+        Args:
+            weights: list or np.array, entry i is the weight / frequency of symbol i
+        """
+        self.num_leaves = n = len(weights)
+        self.left, self.right = two_queue_merge(weights)
+        self.parent = np.full(max(2 * n - 1, 0), -1, dtype=np.int64)
+        self.parent[self.left] = np.arange(n, 2 * n - 1)
+        self.parent[self.right] = np.arange(n, 2 * n - 1)
+        self.root = 2 * n - 2 if n else None
+
+        self.lengths = merge_depths(self.left, self.right) if n else np.zeros(0, dtype=np.int64)
+        self.codes = canonical_codes(self.lengths)
+        self.code_strs = {}
+
+    def code(self, symbol: int):
+        """
+        Code for a symbol as a string of bits, generated on first request and cached
+        Args:
+            symbol: int, index of the symbol
+
+        Returns: str, code for the symbol
+        """
+        if symbol not in self.code_strs:
+            length = int(self.lengths[symbol])
+            self.code_strs[symbol] = format(self.codes[symbol], "0{}b".format(length)) if length else ''
+        return self.code_strs[symbol]
+
+    def code_dict(self):
+        """
+        String codes for all symbols, as produced by HuffmanTree
+        Returns: dict of codes, key i has value of the code for symbol i
+        """
+        return {i: self.code(i) for i in range(self.num_leaves)}
@@ -0,0 +1,238 @@
+"""
+Bulk Huffman codec for byte streams, built on the code lengths from the huffman module.
+
+Files are compressed in two streaming passes: the first counts byte frequencies chunk by chunk, the second encodes
+each chunk with canonical codes. Codes are limited to LOOKUP_BITS, so decoding is a single table lookup per symbol on
+the next LOOKUP_BITS of the stream. The compressed file holds the original size and the 256 code lengths, followed by
+the packed bits.
+"""
+import numpy as np
+from data_structures import huffman as hf
+
+# Maximum code length, and bits peeked per decoding table lookup
+LOOKUP_BITS = 11
+
+# Bytes read per chunk when streaming
+CHUNK_BYTES = 1 << 20
+
+
+def byte_counts(src: str, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Frequency of each byte value in a file, read in chunks
+    Args:
+        src: file path for the input
+        chunk_bytes: int, bytes read per chunk. Optional, default CHUNK_BYTES
+
+    Returns: np.array of int, count of byte value i at index i
+    """
+    counts = np.zeros(256, dtype=np.int64)
+    with open(src, "rb") as file:
+        while True:
+            chunk = file.read(chunk_bytes)
+            if not chunk:
+                break
+            counts += np.bincount(np.frombuffer(chunk, dtype=np.uint8), minlength=256)
+    return counts
+
+def code_lengths(counts, max_len: int = LOOKUP_BITS):
+    """
+    Code length for each byte value, at most max_len. Unused values get length 0 and a lone used value length 1.
+    Args:
+        counts: np.array of int, count of byte value i at index i
+        max_len: int, maximum code length. Optional, default LOOKUP_BITS
+
+    Returns: np.array of int, code length of byte value i at index i
+    """
+    lengths = np.zeros(len(counts), dtype=np.int64)
+    used = np.flatnonzero(counts)
+    if len(used) == 1:
+        lengths[used] = 1
+    elif len(used) > 1:
+        used_lengths = hf.merge_depths(*hf.two_queue_merge(counts[used]))
+        if used_lengths.max() > max_len:
+            used_lengths = hf.package_merge(counts[used], max_len)
+        lengths[used] = used_lengths
+    return lengths
+
+def code_table(lengths):
+    """
+    Canonical codes for the used byte values
+    Args:
+        lengths: np.array of int, code length of byte value i at index i, 0 if unused
+
+    Returns: np.array of int, code of byte value i at index i, 0 if unused
+    """
+    codes = np.zeros(len(lengths), dtype=np.int64)
+    used = np.flatnonzero(lengths)
+    codes[used] = hf.canonical_codes(lengths[used])
+    return codes
+
+def decode_table(lengths, codes):
+    """
+    Lookup tables for decoding. Every window of L bits, with L the longest code length, starts with exactly one code,
+    so the window indexes the symbol and its code length directly.
+    Args:
+        lengths: np.array of int, code length of byte value i at index i, 0 if unused
+        codes: np.array of int, code of byte value i at index i
+
+    Returns:
+        symbols: list of int, symbol for each L-bit window
+        sizes: list of int, code length for each L-bit window
+        L: int, bits per lookup
+    """
+    L = int(lengths.max())
+    symbols = np.zeros(1 << L, dtype=np.int64)
+    sizes = np.zeros(1 << L, dtype=np.int64)
+    for s in np.flatnonzero(lengths).tolist():
+        lo = int(codes[s]) << (L - int(lengths[s]))
+        hi = (int(codes[s]) + 1) << (L - int(lengths[s]))
+        symbols[lo:hi] = s
+        sizes[lo:hi] = lengths[s]
+    return symbols.tolist(), sizes.tolist(), L
+
+def bit_table(lengths, codes):
+    """
+    Bits of the code for every byte value, as rows of a table padded to the longest code length
+    Args:
+        lengths: np.array of int, code length of byte value i at index i
+        codes: np.array of int, code of byte value i at index i
+
+    Returns:
+        bits: 2D np.array of uint8, row i holds the bits of the code of byte value i, most significant first
+        valid: 2D np.array of bool, True for the first lengths[i] entries of row i
+    """
+    shift = lengths[:, None] - 1 - np.arange(int(lengths.max(initial=0)))
+    valid = shift >= 0
+    bits = ((codes[:, None] >> np.maximum(shift, 0)) & 1).astype(np.uint8)
+    return bits, valid
+
+def encode_bits(data, bits, valid):
+    """
+    Bits of the encoded data, by gathering each byte's row of the bit table
+    Args:
+        data: np.array of uint8, the bytes to encode
+        bits: 2D np.array of uint8, bit table from bit_table
+        valid: 2D np.array of bool, valid entries of the bit table
+
+    Returns: np.array of uint8, one entry per bit, 0 or 1
+    """
+    return bits[data][valid[data]]
+
+
+class BitWriter:
+    """
+    Packs a stream of bits into bytes written to a file. Whole bytes are packed and written as they arrive, the
+    remaining bits are carried over to the next write.
+    """
+    def __init__(self, file):
+        """
+        Constructor
+        Args:
+            file: binary file object to write to
+        """
+        self.file = file
+        self.carry = np.zeros(0, dtype=np.uint8)
+        self.bytes_written = 0
+
+    def write(self, bits):
+        """
+        Write bits, packing all whole bytes
+        Args:
+            bits: np.array of uint8, one entry per bit, 0 or 1
+
+        Returns: None
+        """
+        bits = np.concatenate((self.carry, bits))
+        full = len(bits) // 8 * 8
+        packed = np.packbits(bits[:full])
+        self.file.write(memoryview(packed))
+        self.bytes_written += len(packed)
+        self.carry = bits[full:]
+        return None
+
+    def flush(self):
+        """
+        Write any carried bits, padded with zeros to a whole byte
+        Returns: None
+        """
+        if len(self.carry):
+            packed = np.packbits(self.carry)
+            self.file.write(memoryview(packed))
+            self.bytes_written += len(packed)
+            self.carry = np.zeros(0, dtype=np.uint8)
+        return None
+
+
+def compress_file(src: str, dst: str, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Compress a file, streaming it in chunks
+    Args:
+        src: file path for the input
+        dst: file path for the compressed output
+        chunk_bytes: int, bytes read per chunk. Optional, default CHUNK_BYTES
+
+    Returns:
+        size_in: int, bytes read
+        size_out: int, bytes written
+    """
+    counts = byte_counts(src, chunk_bytes)
+    lengths = code_lengths(counts)
+    bits, valid = bit_table(lengths, code_table(lengths))
+
+    with open(src, "rb") as file_in, open(dst, "wb") as file_out:
+        # Header: original size and the code lengths
+        file_out.write(int(counts.sum()).to_bytes(8, "little"))
+        file_out.write(lengths.astype(np.uint8).tobytes())
+
+        writer = BitWriter(file_out)
+        while True:
+            chunk = file_in.read(chunk_bytes)
+            if not chunk:
+                break
+            writer.write(encode_bits(np.frombuffer(chunk, dtype=np.uint8), bits, valid))
+        writer.flush()
+    return int(counts.sum()), 8 + 256 + writer.bytes_written
+
+def decompress_file(src: str, dst: str, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Decompress a file written by compress_file, streaming it in chunks. Bits are accumulated in an integer buffer,
+    and each symbol is decoded by one table lookup on the next L bits.
+    Args:
+        src: file path for the compressed input
+        dst: file path for the output
+        chunk_bytes: int, bytes read per chunk. Optional, default CHUNK_BYTES
+
+    Returns: int, bytes written
+    """
+    with open(src, "rb") as file_in, open(dst, "wb") as file_out:
+        remaining = total = int.from_bytes(file_in.read(8), "little")
+        lengths = np.frombuffer(file_in.read(256), dtype=np.uint8).astype(np.int64)
+        if not total:
+            return 0
+        symbols, sizes, L = decode_table(lengths, code_table(lengths))
+        mask = (1 << L) - 1
+
+        acc = 0
+        nbits = 0
+        out = bytearray()
+        while remaining:
+            chunk = file_in.read(chunk_bytes)
+            if not chunk:
+                # Zero padding lets the last codes be looked up with a full window
+                chunk = bytes(L // 8 + 1)
+            for byte in chunk:
+                acc = (acc << 8) | byte
+                nbits += 8
+                while nbits >= L:
+                    i = (acc >> (nbits - L)) & mask
+                    out.append(symbols[i])
+                    nbits -= sizes[i]
+                    remaining -= 1
+                    if not remaining:
+                        break
+                acc &= (1 << nbits) - 1
+                if not remaining:
+                    break
+            file_out.write(out)
+            out.clear()
+    return total
@@ -1,15 +1,31 @@
+import numpy as np
 
 class UnionFind:
     """
-    Union-find data structure. Implemented with lazy union by rank and path compression
+    Union-find over arbitrary hashable keys. Thin adapter over DenseUnionFind: each key is given a dense integer id
+    as it is added, and finds and unions are forwarded to the array-backed structure. The arrays grow by doubling, so
+    adding members is amortized O(1).
     """
     def __init__(self):
         """
         Constructor
         """
-        self.parents = {}
-        self.ranks = {}
+        # Dense id of each key, and the key of each dense id
         self.ids = {}
+        self.keys = []
+        self.dense = DenseUnionFind(0)
+
+    @property
+    def num_components(self):
+        # Spare capacity in the dense arrays is held as singletons, which are not members
+        return self.dense.num_components - (len(self.dense.parents) - len(self.keys))
+
+    @property
+    def parents(self):
+        """
+        Parent key of every member, built from the dense arrays. A copy, for callers reading the old dict layout.
+        """
+        return {key: self.keys[p] for key, p in zip(self.keys, self.dense.parents[:len(self.keys)].tolist())}
 
     def add_member(self, member: int):
         """
@@ -19,55 +35,171 @@ class UnionFind:
 
         Returns: None
         """
-        # Add member, given rank 0 and as its own parent
+        # Add member as a singleton, with the next dense id
         if member not in self.ids:
-            self.ids[member] = member
-            self.parents[member] = member
-            self.ranks[member] = 0
+            n = len(self.keys)
+            if n == len(self.dense.parents):
+                self.dense.grow(max(2 * n, 16))
+            self.ids[member] = n
+            self.keys.append(member)
         return None
 
     def find(self, member: int):
         """
-        Recursively find the root, or oldest ancestor, of a member
+        Find the root, or oldest ancestor, of a member
         Args:
             member: unique, hashable key for the member to find the root for
 
         Returns: key of the root, or oldest ancestor
         """
-        if self.parents[member] == member:
-            return self.parents[member]
-        else:
-            return self.find(self.parents[member])
+        return self.keys[self.dense.find(self.ids[member])]
 
     def union(self, member_1: int, member_2: int):
         """
-        Lazy union by rank with path compression. This refers to two specific optimizations
-            1. Union by rank: when combining sub-trees, the root with the greater maximum
-            steps to reach a leaf becomes the root of the resulting tree
-            2. Path compression: upon completing a union of two members, both members along with
-            the lower rank parent, take the remaining parent as their own. I.e. paths are compressed
-            directly to a single root.
+        Merge the components of two members, by size
         Args:
             member_1: key of member_1
             member_2: key of member_2
 
+        Returns: bool, True if the members were in different sub-trees and have been merged
+        """
+        return self.dense.union(self.ids[member_1], self.ids[member_2])
+
+
+class DenseUnionFind:
+    """
+    Array-backed union-find for members labelled 0..n-1. Parents and sizes are held in int32 arrays. Finds use
+    iterative path halving, so deep chains never hit the recursion limit, and unions attach the smaller tree under
+    the larger. The number of components is maintained on every union.
+    """
+    def __init__(self, n: int):
+        """
+        Constructor
+        Args:
+            n: int, number of members, labelled 0..n-1
+        """
+        self.parents = np.arange(n, dtype=np.int32)
+        self.sizes = np.ones(n, dtype=np.int32)
+        self.num_components = n
+
+    def grow(self, n: int):
+        """
+        Extend the structure to n members, the new ones as singletons
+        Args:
+            n: int, new number of members
+
         Returns: None
         """
-        # Get the current parents
-        parent_1 = self.find(member_1)
-        parent_2 = self.find(member_2)
-
-        # Maintain the root with the larger rank
-        if self.ranks[parent_1] >= self.ranks[parent_2]:
-            # Path compressed union
-            self.parents[member_2] = parent_1
-            self.parents[parent_2] = parent_1
-            # If the ranks are the same, increase the new parent's rank by 1
-            if self.ranks[parent_1] == self.ranks[parent_2]:
-                self.ranks[parent_1] += 1
-        else:
-            # Path compressed union
-            self.parents[member_1] = parent_2
-            self.parents[parent_1] = parent_2
+        old = len(self.parents)
+        self.parents = np.concatenate((self.parents, np.arange(old, n, dtype=np.int32)))
+        self.sizes = np.concatenate((self.sizes, np.ones(n - old, dtype=np.int32)))
+        self.num_components += n - old
         return None
 
+    def find(self, member: int):
+        """
+        Find the root of a member. Path halving points every other node on the way at its grandparent.
+        Args:
+            member: int, label of the member to find the root for
+
+        Returns: int, label of the root
+        """
+        parents = self.parents
+        while parents[member] != member:
+            parents[member] = parents[parents[member]]
+            member = parents[member]
+        return int(member)
+
+    def union(self, member_1: int, member_2: int):
+        """
+        Union by size: the root of the smaller tree is attached to the root of the larger
+        Args:
+            member_1: int, label of member_1
+            member_2: int, label of member_2
+
+        Returns: bool, True if the members were in different components and have been merged
+        """
+        root_1 = self.find(member_1)
+        root_2 = self.find(member_2)
+        if root_1 == root_2:
+            return False
+
+        if self.sizes[root_1] < self.sizes[root_2]:
+            root_1, root_2 = root_2, root_1
+        self.parents[root_2] = root_1
+        self.sizes[root_1] += self.sizes[root_2]
+        self.num_components -= 1
+        return True
+
+    def find_many(self, members):
+        """
+        Find the roots of many members at once by vectorized pointer jumping. The members are pointed straight at
+        their roots afterwards.
+        Args:
+            members: np.array of int, labels of the members
+
+        Returns: np.array of int32, root of each member
+        """
+        members = np.asarray(members)
+        roots = self.parents[members]
+        while True:
+            grand = self.parents[roots]
+            if np.array_equal(grand, roots):
+                break
+            roots = grand
+        self.parents[members] = roots
+        return roots
+
+    def labels(self):
+        """
+        Root of every member, fully compressing all paths
+        Returns: np.array of int32, root of member i at index i
+        """
+        return self.find_many(np.arange(len(self.parents)))
+
+    def union_edges(self, edges_sorted, stop_at_components: int = 1):
+        """
+        Bulk union over an array of edges already sorted by weight, as in Kruskal's algorithm. Each edge joining two
+        components is accepted and its components merged, until only stop_at_components remain. The loop runs over
+        plain lists copied out of the arrays and written back at the end.
+        Args:
+            edges_sorted: 2D np.array of int, one edge per row with the member labels in the first two columns
+            stop_at_components: int, stop once this many components remain. Optional, default 1
+
+        Returns:
+            accepted: np.array of bool, True for edges that merged two components
+            num_components: int, number of components at the end
+        """
+        edges_sorted = np.asarray(edges_sorted)
+        parents = self.parents.tolist()
+        sizes = self.sizes.tolist()
+        num_components = self.num_components
+        accepted = []
+
+        for e, (a, b) in enumerate(zip(edges_sorted[:, 0].tolist(), edges_sorted[:, 1].tolist())):
+            if num_components <= stop_at_components:
+                break
+            # Find both roots with path halving
+            while parents[a] != a:
+                parents[a] = parents[parents[a]]
+                a = parents[a]
+            while parents[b] != b:
+                parents[b] = parents[parents[b]]
+                b = parents[b]
+            if a == b:
+                continue
+
+            # Union by size
+            if sizes[a] < sizes[b]:
+                a, b = b, a
+            parents[b] = a
+            sizes[a] += sizes[b]
+            num_components -= 1
+            accepted.append(e)
+
+        self.parents[:] = parents
+        self.sizes[:] = sizes
+        self.num_components = num_components
+        mask = np.zeros(len(edges_sorted), dtype=bool)
+        mask[accepted] = True
+        return mask, num_components
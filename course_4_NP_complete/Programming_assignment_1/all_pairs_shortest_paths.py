@@ -78,6 +78,7 @@ class Graph:
         self.num_vertices = 0
         self.num_edges = 0
         self.re_weighted = False
+        self.weights = None
 
     def add_vertex(self, key):
         """
@@ -197,31 +198,102 @@ class Graph:
         Running time is O(n^2log(n) + mn), the n calls to Dijkstra (nlog(n)) plus the single call the Bellman-Ford
 
         Returns:
-            A: np.array with the shortest path lengths
+            A: np.array with the shortest path lengths. None if negative cycles detected.
         """
 
         print("Running Johnson's algo")
 
-        # If not done already, re-weight to remove any negative edges
-        if not self.re_weighted:
-            print("Computing weights for re-weighting")
-            weights = self.bellman_ford(list(self.vertices.keys())[0], re_weight=True)
-            self.re_weight(weights)
-
         # Initialize the output array with boundary conditions
         A = np.full((self.num_vertices, self.num_vertices), np.inf)
 
-        # Having re-weighted, perform Dijkstra from each vertex
+        # Fill the output one source row at a time
         print("Finding shortest paths")
-        for u in self.vertices:
-            A[u, :] = self.dijkstra(u)
-
-            # Adjust to the true lengths using the weights
-            A[u, :] = A[u, :] + weights - weights[u]
+        rows = self.johnson_rows()
+        if rows is None:
+            return None
+        for u, row in rows:
+            A[u, :] = row
 
         print("Smallest minimum pair path:", A.min())
         return A
 
+    def johnson_weights(self):
+        """
+        Compute the Bellman-Ford vertex weights for Johnson's algo and re-weight the graph, if not done already. The
+        weights are retained so later calls don't have to repeat the Bellman-Ford pass.
+
+        Returns:
+            self.weights: np array of vertex weights. None if negative cycles detected.
+        """
+        if not self.re_weighted:
+            print("Computing weights for re-weighting")
+            self.weights = self.bellman_ford(list(self.vertices.keys())[0], re_weight=True)
+            if self.weights is None:
+                return None
+            self.re_weight(self.weights)
+        return self.weights
+
+    def johnson_rows(self):
+        """
+        Streaming variant of Johnson's algo. Rather than allocating the full n x n matrix, shortest path lengths are
+        produced one source vertex at a time, so memory use is O(n) on top of the graph itself.
+
+        Returns:
+            generator of (u, row) pairs, row being the np array of shortest path lengths from source u. None if
+            negative cycles detected.
+        """
+        weights = self.johnson_weights()
+        if weights is None:
+            return None
+
+        def rows():
+            # Dijkstra from each vertex, adjusting to the true lengths using the weights
+            for u in self.vertices:
+                yield u, self.dijkstra(u) + weights - weights[u]
+
+        return rows()
+
+    def johnson_to_file(self, path: str, dtype=np.float64):
+        """
+        Run Johnson's algo, writing each row of shortest path lengths to a memory-mapped file as it is computed. Only
+        the row being written needs to be resident in memory.
+
+        Args:
+            path: str, file path for the memory-mapped output
+            dtype: np dtype for the stored path lengths, optional, default float64
+
+        Returns:
+            A: np.memmap with the shortest path lengths. None if negative cycles detected.
+        """
+        rows = self.johnson_rows()
+        if rows is None:
+            return None
+
+        A = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(self.num_vertices, self.num_vertices))
+        for u, row in rows:
+            A[u, :] = row
+        A.flush()
+        return A
+
+    def johnson_min(self):
+        """
+        Smallest shortest path length over all pairs, computed on the fly from the streamed rows of Johnson's algo.
+        The full matrix is never held in memory.
+
+        Returns:
+            min_path: float, smallest minimum pair path. None if negative cycles detected.
+        """
+        rows = self.johnson_rows()
+        if rows is None:
+            return None
+
+        min_path = np.inf
+        for _, row in rows:
+            min_path = min(min_path, row.min())
+
+        print("Smallest minimum pair path:", min_path)
+        return min_path
+
     def bellman_ford(self, start: int, check_negative: bool = True, re_weight: bool = False):
         """
         Bellman-Ford algorithm for computing the minimum path lengths from a single source.
@@ -369,3 +441,5 @@ if __name__ == "__main__":
 
 
 
+    # Run streaming Johnson, only the global minimum is retained
+    cProfile.run('G3.johnson_min()')
@@ -1,6 +1,14 @@
 import numpy as np
 import itertools
 import cProfile
+import multiprocessing
+import resource
+import time
+from multiprocessing import shared_memory
+from data_structures import geometry, lower_bound
+
+# Max number of subsets reduced at once by the bitmask Held-Karp engine
+HK_CHUNK = 1 << 16
 
 def read_input(src: str):
     """
@@ -17,21 +25,18 @@ def read_input(src: str):
             inp.append([float(i) for i in line.split()])
     return inp
 
-def compute_dist_matrix(g):
+def compute_dist_matrix(g, dtype=np.float64):
     """
     Compute a matrix of Euclidean distances between all vertices
 
     Args:
         g:  list, input list of vertex coordinates
+        dtype: np dtype of the matrix, optional, default float64
 
     Returns:
         d: 2D np array of distances
     """
-    d = np.zeros((len(g), len(g)))
-    for i in range(len(g)):
-        for j in range(len(g)):
-            d[i, j] = d[j, i] = np.sqrt((g[i][0] - g[j][0])**2 + (g[i][1] - g[j][1])**2)
-    return d
+    return geometry.dist_matrix(g, dtype=dtype)
 
 def tsp_dynamic(d):
     """
@@ -72,6 +77,425 @@ def tsp_dynamic(d):
     print('Minimum cost solution:', tsp_sol)
     return tsp_sol
 
+def popcount(x):
+    """
+    Vectorized count of set bits for an array of non-negative integers, using a byte lookup table
+
+    Args:
+        x: np.array of non-negative integers
+
+    Returns:
+        c: np.array of uint8, number of set bits in each entry
+    """
+    x = np.ascontiguousarray(x, dtype=np.uint64)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+def held_karp_layer(prev_masks, prev_cost, masks, d_sub, chunk: int = HK_CHUNK):
+    """
+    Compute one cardinality layer of the Held-Karp recurrence. For every subset S in the layer and every j in S,
+    the minimum cost of a path from the home city visiting all of S and ending at j is the best over k of the
+    previous layer's S - {j} ending at k, plus the edge k -> j.
+
+    Args:
+        prev_masks: np.array, sorted bitmasks of the previous layer
+        prev_cost: 2D np.array, path costs of the previous layer, row per mask, column per end city. inf if absent.
+        masks: np.array, sorted bitmasks of the current layer
+        d_sub: 2D np.array, distances between the non-home cities
+        chunk: int, max number of subsets to reduce at once, bounds the size of temporaries. Optional.
+
+    Returns:
+        cost: 2D np.array, path costs for the current layer
+        parent: 2D np.array of int8, best previous end city for each entry, -1 if absent
+    """
+    m = d_sub.shape[0]
+    cost = np.full((len(masks), m), np.inf, dtype=prev_cost.dtype)
+    parent = np.full((len(masks), m), -1, dtype=np.int8)
+
+    for j in range(m):
+        # Subsets in this layer containing j, and the index of the same subset without j in the previous layer
+        rows = np.flatnonzero(masks & (1 << j))
+        for lo in range(0, len(rows), chunk):
+            r = rows[lo:lo + chunk]
+            prev_idx = np.searchsorted(prev_masks, masks[r] ^ (1 << j))
+            # Absent end cities are inf in the previous layer, so they never win the min
+            cand = prev_cost[prev_idx] + d_sub[:, j]
+            best = cand.argmin(axis=1)
+            cost[r, j] = cand[np.arange(len(r)), best]
+            parent[r, j] = best
+    return cost, parent
+
+def tsp_held_karp(d, return_tour: bool = True, verbose: bool = True):
+    """
+    Bitmask implementation of the Held-Karp dynamic programming solution to the TSP. Subsets of the non-home cities
+    are indexed by integer bitmask and processed one cardinality layer at a time with vectorized min-reductions, so
+    only two layers of path costs are held in memory. With return_tour, the int8 parent table of each layer is the
+    only memory kept beyond those two layers; the layer's masks are recomputed from the popcounts when walking back.
+
+    Args:
+        d: np.array, 2D nxn np array of distances between n nodes
+        return_tour: bool, keep the per-layer choices needed to recover the optimal tour. Optional, default True
+        verbose: bool, print the solution cost. Optional, default True
+
+    Returns:
+        tsp_sol: float, cost of minimum cost tour
+        tour: list, order of cities visited in the optimal tour, starting from city 0. None if return_tour is False
+    """
+    n = d.shape[0]
+    if n < 2:
+        return 0.0, [0]
+
+    # Home city is 0, bit j of a mask stands for city j + 1
+    m = n - 1
+    d_sub = d[1:, 1:]
+    bits = popcount(np.arange(1 << m, dtype=np.uint64))
+
+    # Base case, paths from home visiting a single city
+    masks = (1 << np.arange(m)).astype(np.int64)
+    cost = np.full((m, m), np.inf, dtype=d.dtype)
+    cost[np.arange(m), np.arange(m)] = d[0, 1:]
+    parents = []
+
+    # Recurrence, one cardinality layer at a time
+    for c in range(2, m + 1):
+        prev_masks = masks
+        masks = np.flatnonzero(bits == c).astype(np.int64)
+        cost, parent = held_karp_layer(prev_masks, cost, masks, d_sub)
+        if return_tour:
+            parents.append(parent)
+
+    # Add the final edge back to home
+    closing = cost[0] + d[1:, 0]
+    j = int(closing.argmin())
+    tsp_sol = closing[j]
+    if verbose:
+        print('Minimum cost solution:', tsp_sol)
+
+    if not return_tour:
+        return tsp_sol, None
+    return tsp_sol, held_karp_tour(parents, bits, j, m)
+
+def held_karp_tour(parents: list, bits, j: int, m: int):
+    """
+    Recover the optimal tour by walking back through the per-layer choices of the Held-Karp recurrence. Each layer's
+    sorted masks are recomputed from the popcounts as the walk reaches it, rather than kept from the forward pass.
+
+    Args:
+        parents: list of int8 parent tables, one per cardinality layer starting from pairs
+        bits: np.array, popcount of every mask over the non-home cities
+        j: int, last non-home city visited in the optimal tour, bit index
+        m: int, number of non-home cities
+
+    Returns:
+        tour: list, order of cities visited, starting from city 0
+    """
+    tour = []
+    S = (1 << m) - 1
+    for c, parent in zip(range(m, 1, -1), reversed(parents)):
+        tour.append(j + 1)
+        masks = np.flatnonzero(bits == c)
+        k = int(parent[np.searchsorted(masks, S), j])
+        S ^= 1 << j
+        j = k
+    tour.append(j + 1)
+    tour.append(0)
+    tour.reverse()
+    return tour
+
+def shared_array(shape, dtype):
+    """
+    Allocate a np array backed by a shared memory block, so pool workers can attach to it without copying
+
+    Args:
+        shape: tuple, array shape
+        dtype: np dtype of the array
+
+    Returns:
+        shm: shared_memory.SharedMemory, the block. Caller is responsible for close and unlink
+        arr: np.array view onto the block
+        spec: tuple, (name, shape, dtype str) for attaching from another process
+    """
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+    arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return shm, arr, (shm.name, shape, dtype.str)
+
+def attach_array(spec: tuple):
+    """
+    Attach to a shared memory array allocated by shared_array
+
+    Args:
+        spec: tuple, (name, shape, dtype str) of the array
+
+    Returns:
+        shm: shared_memory.SharedMemory, the block. Caller is responsible for close
+        arr: np.array view onto the block
+    """
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+def held_karp_chunk(task: tuple):
+    """
+    Pool worker for the parallel Held-Karp engine. Computes a contiguous block of subsets in the current layer,
+    reading the previous layer from shared memory and writing results into the shared output arrays.
+
+    Args:
+        task: tuple, (prev_masks, prev_cost, masks, cost, parent) shared array specs, then lo, hi bounds of the
+            block in the current layer and the non-home distance matrix
+
+    Returns:
+        float, current RSS of the worker process at the end of the task, in MB
+    """
+    *specs, lo, hi, d_sub = task
+    attached = [attach_array(spec) for spec in specs]
+    prev_masks, prev_cost, masks, cost, parent = [arr for _, arr in attached]
+
+    cost[lo:hi], parent[lo:hi] = held_karp_layer(prev_masks, prev_cost, masks[lo:hi], d_sub)
+
+    del prev_masks, prev_cost, masks, cost, parent
+    for shm, _ in attached:
+        shm.close()
+    return current_rss_mb()
+
+def current_rss_mb():
+    """
+    Current resident set size of this process, in MB, read from /proc/self/statm
+
+    Returns:
+        float, RSS in MB
+    """
+    with open("/proc/self/statm") as file:
+        resident = int(file.read().split()[1])
+    return resident * resource.getpagesize() / 2 ** 20
+
+def release_shared(blocks: list):
+    """
+    Close and unlink shared memory blocks allocated by shared_array
+
+    Args:
+        blocks: list of shared_memory.SharedMemory
+
+    Returns:
+        None
+    """
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+    return None
+
+def tsp_held_karp_parallel(d, workers: int = None, dtype=np.float64, return_tour: bool = True,
+                           block: int = HK_CHUNK):
+    """
+    Parallel variant of the bitmask Held-Karp engine. The subsets in each cardinality layer depend only on the
+    previous layer, so each layer is split into independent blocks that are computed across a process pool. The
+    previous and current layers live in shared memory, and float32 storage halves their footprint. With
+    return_tour, the int8 parent table of each layer is the only memory kept beyond those two layers. Progress, the
+    largest worker RSS at the end of the layer's tasks and the current RSS of the parent are reported after each
+    layer. Shared memory is
+    released even if a layer fails.
+
+    Args:
+        d: np.array, 2D nxn np array of distances between n nodes
+        workers: int, number of worker processes. Optional, default is the number of cores
+        dtype: np dtype for the stored path costs, optional, default float64. float32 halves memory.
+        return_tour: bool, keep the per-layer choices needed to recover the optimal tour. Optional, default True
+        block: int, number of subsets per worker task. Optional
+
+    Returns:
+        tsp_sol: float, cost of minimum cost tour
+        tour: list, order of cities visited in the optimal tour, starting from city 0. None if return_tour is False
+    """
+    n = d.shape[0]
+    if n < 2:
+        return 0.0, [0]
+
+    m = n - 1
+    d = d.astype(dtype)
+    d_sub = d[1:, 1:]
+    bits = popcount(np.arange(1 << m, dtype=np.uint64))
+
+    # Base case, paths from home visiting a single city
+    prev_shm = []
+    cur_shm = []
+    masks = cost = parent = None
+    try:
+        shm, masks, masks_spec = shared_array((m,), np.int64)
+        prev_shm.append(shm)
+        masks[:] = 1 << np.arange(m)
+        shm, cost, cost_spec = shared_array((m, m), dtype)
+        prev_shm.append(shm)
+        cost[:] = np.inf
+        cost[np.arange(m), np.arange(m)] = d[0, 1:]
+        parents = []
+
+        with multiprocessing.Pool(workers) as pool:
+            for c in range(2, m + 1):
+                begin = time.time()
+                prev_masks_spec, prev_cost_spec = masks_spec, cost_spec
+
+                # Shared arrays for the current layer
+                layer_masks = np.flatnonzero(bits == c)
+                shm, masks, masks_spec = shared_array(layer_masks.shape, np.int64)
+                cur_shm.append(shm)
+                masks[:] = layer_masks
+                shm, cost, cost_spec = shared_array((len(layer_masks), m), dtype)
+                cur_shm.append(shm)
+                shm, parent, parent_spec = shared_array((len(layer_masks), m), np.int8)
+                cur_shm.append(shm)
+
+                # Independent blocks of the layer, spread across the pool
+                tasks = [(prev_masks_spec, prev_cost_spec, masks_spec, cost_spec, parent_spec,
+                          lo, min(lo + block, len(layer_masks)), d_sub) for lo in range(0, len(layer_masks), block)]
+                worker_rss = pool.map(held_karp_chunk, tasks)
+
+                if return_tour:
+                    parents.append(np.array(parent))
+                parent = None
+
+                # The previous layer is no longer needed
+                release_shared(prev_shm)
+                release_shared(cur_shm[2:])
+                prev_shm, cur_shm = cur_shm[:2], []
+
+                print("Layer", c, "of", m, ":", len(layer_masks), "subsets in", time.time() - begin,
+                      "seconds, worker RSS", max(worker_rss), "MB, parent RSS", current_rss_mb(), "MB")
+
+        # Add the final edge back to home
+        closing = cost[0] + d[1:, 0]
+        j = int(closing.argmin())
+        tsp_sol = float(closing[j])
+    finally:
+        # Views must be dropped before the blocks can be closed
+        masks = cost = parent = None
+        release_shared(prev_shm + cur_shm)
+    print('Minimum cost solution:', tsp_sol)
+
+    if not return_tour:
+        return tsp_sol, None
+    return tsp_sol, held_karp_tour(parents, bits, j, m)
+
+def tour_cost(coords, tour: list):
+    """
+    Total length of a closed tour
+
+    Args:
+        coords: 2D np.array, city coordinates
+        tour: list, order of cities visited
+
+    Returns:
+        float, tour length including the edge back to the start
+    """
+    p = coords[tour]
+    return float(np.sqrt(((p - np.roll(p, -1, axis=0)) ** 2).sum(axis=1)).sum())
+
+def split_cities(coords, idx, split: str = "kd"):
+    """
+    Geometric split of a set of cities in two along the axis with the larger spread
+
+    Args:
+        coords: 2D np.array, city coordinates
+        idx: np.array, indices of the cities to split
+        split: str, "kd" to cut at the median, "gap" to cut at the widest gap between consecutive cities, i.e. a
+            natural boundary between clusters. Optional, default "kd"
+
+    Returns:
+        left: np.array, indices of cities below the cut
+        right: np.array, indices of cities above the cut
+        axis: int, axis of the cut
+        cut: float, coordinate of the cut along the axis
+    """
+    pts = coords[idx]
+    axis = int(np.ptp(pts, axis=0).argmax())
+    order = np.argsort(pts[:, axis], kind="stable")
+    vals = pts[order, axis]
+
+    if split == "gap":
+        at = int(np.diff(vals).argmax()) + 1
+    else:
+        at = len(idx) // 2
+    return idx[order[:at]], idx[order[at:]], axis, (vals[at - 1] + vals[at]) / 2
+
+def stitch_tours(coords, tour_1: list, tour_2: list, axis: int, cut: float, boundary: int = 64):
+    """
+    Merge two tours into one by removing an edge from each and reconnecting the ends with two boundary-crossing
+    edges. Candidate edges are the boundary edges of each tour, those with midpoints closest to the cut, and the
+    cheapest exchange over all candidate pairs and both orientations is taken.
+
+    Args:
+        coords: 2D np.array, city coordinates
+        tour_1: list, tour on one side of the cut
+        tour_2: list, tour on the other side of the cut
+        axis: int, axis of the cut
+        cut: float, coordinate of the cut along the axis
+        boundary: int, max number of candidate edges per tour. Optional, default 64
+
+    Returns:
+        list, merged tour
+    """
+    def candidates(tour):
+        t = np.asarray(tour)
+        a, b = t, np.roll(t, -1)
+        mid = (coords[a, axis] + coords[b, axis]) / 2
+        keep = np.argsort(np.abs(mid - cut), kind="stable")[:boundary]
+        return keep, a[keep], b[keep]
+
+    i1, a, b = candidates(tour_1)
+    i2, c, e = candidates(tour_2)
+
+    # Change in cost for every pair of removed edges, for both ways of reconnecting
+    removed = np.linalg.norm(coords[a] - coords[b], axis=1)[:, None] + np.linalg.norm(coords[c] - coords[e], axis=1)[None, :]
+    cross = geometry.pair_dist(coords[a], coords[c]) + geometry.pair_dist(coords[b], coords[e])
+    twist = geometry.pair_dist(coords[a], coords[e]) + geometry.pair_dist(coords[b], coords[c])
+    delta = np.stack([cross, twist]) - removed
+    flip, x, y = np.unravel_index(delta.argmin(), delta.shape)
+
+    # Open both tours at the removed edges and join the resulting paths
+    i, j = i1[x], i2[y]
+    path_1 = tour_1[i + 1:] + tour_1[:i + 1]
+    path_2 = tour_2[j + 1:] + tour_2[:j + 1]
+    if flip == 0:
+        path_2.reverse()
+    return path_1 + path_2
+
+def tsp_decomposition(coords, max_part: int = 12, split: str = "kd", boundary: int = 64):
+    """
+    Approximate the TSP for instances too large for Held-Karp by spatial decomposition. Cities are split
+    recursively with geometric cuts until each part has at most max_part cities, each part is solved exactly with
+    the bitmask Held-Karp engine, and sibling tours are stitched back together across the cut. The Held-Karp 1-tree
+    lower bound reports how close the stitched tour is to optimal.
+
+    Args:
+        coords: list or 2D np.array, city coordinates
+        max_part: int, max number of cities solved exactly at once. Optional, default 12
+        split: str, "kd" for median cuts, "gap" for cuts at the widest gap between clusters. Optional, default "kd"
+        boundary: int, max number of candidate edges per tour when stitching. Optional, default 64
+
+    Returns:
+        cost: float, length of the stitched tour
+        tour: list, order of cities visited, starting from city 0
+        bound: float, lower bound on the optimal tour length
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+
+    def solve(idx):
+        # Base case, small enough for Held-Karp
+        if len(idx) <= max_part:
+            pts = coords[idx]
+            _, local = tsp_held_karp(geometry.pair_dist(pts, pts), verbose=False)
+            return [int(idx[k]) for k in local]
+        left, right, axis, cut = split_cities(coords, idx, split)
+        return stitch_tours(coords, solve(left), solve(right), axis, cut, boundary)
+
+    tour = solve(np.arange(len(coords)))
+    home = tour.index(0)
+    tour = tour[home:] + tour[:home]
+
+    cost = tour_cost(coords, tour)
+    print('Stitched tour cost:', cost)
+    bound, _ = lower_bound.held_karp_bound(coords, upper=cost)
+    return cost, tour, bound
+
 if __name__ == "__main__":
 
     tsp_g = read_input("tsp.txt")
@@ -80,5 +504,19 @@ if __name__ == "__main__":
 
     cProfile.run('tsp_dynamic(dist_matrix)')
 
+    cProfile.run('tsp_held_karp(dist_matrix)')
+
+    cProfile.run('tsp_held_karp_parallel(dist_matrix, dtype=np.float32)')
+
+    cProfile.run('tsp_decomposition(tsp_g, split="gap")')
+
+    # Two clusters far apart, where the bound is slowest to tighten: check it against the exact optimum
+    rng = np.random.default_rng(0)
+    clusters = np.vstack([rng.random((8, 2)), rng.random((8, 2)) + [10, 0]])
+    optimum, _ = tsp_held_karp(compute_dist_matrix(clusters), return_tour=False, verbose=False)
+    cost, _, bound = tsp_decomposition(clusters, max_part=8, split="gap")
+    assert 0.95 * optimum <= bound <= optimum * (1 + 1e-9), "Bound is invalid or loose on two clusters"
+    print('Two clusters: optimum', optimum, ', stitched', cost, ', bound', bound)
+
 
 
@@ -1,5 +1,12 @@
 import numpy as np
 import cProfile
+import collections
+import math
+import time
+from data_structures import geometry, lower_bound, spatial
+
+# Minimum gain for a local search move to count as an improvement
+EPS = 1e-10
 
 def read_input(src: str):
     """
@@ -16,15 +23,22 @@ def read_input(src: str):
             inp.append([float(i) for i in line.split()[1:]])
     return inp
 
-def compute_sqr_dist_matrix(g):
+def compute_sqr_dist_matrix(g, dtype=np.float64, lazy: bool = False):
     """
     Compute a matrix of squared distances between vertices. Squared distance is used to avoid computing roots.
+
+    Args:
+        g: list, input list of vertex coordinates
+        dtype: np dtype of the matrix, optional, default float64
+        lazy: bool, compute rows on demand instead of storing the matrix, for instances too large for a dense
+            matrix. Optional, default False
+
+    Returns:
+        D: 2D np array of squared distances, or geometry.LazyDistances if lazy
     """
-    D = np.zeros((len(g), len(g)))
-    for i in range(len(g)):
-        for j in range(len(g)):
-            D[i, j] = ((g[i][0] - g[j][0])**2 + (g[i][1] - g[j][1])**2)
-    return D
+    if lazy:
+        return geometry.LazyDistances(g, squared=True, dtype=dtype)
+    return geometry.dist_matrix(g, squared=True, dtype=dtype)
 
 def tsp_nn_heuristic(D):
     """
@@ -67,6 +81,170 @@ def tsp_nn_heuristic(D):
 
 
 
+def tsp_nn_tour(coords):
+    """
+    Build a tour with the nearest neighbor heuristic using a grid spatial index rather than a distance matrix.
+    Visited cities are deleted from the index, so each step is a local nearest neighbor query and memory is O(n).
+    Ties are broken by lowest city index, as in tsp_nn_heuristic.
+
+    Args:
+        coords: list or 2D np.array, city coordinates
+
+    Returns:
+        cost: float, cost of the tour
+        tour: list, order of cities visited, starting from city 0
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    index = spatial.GridIndex(coords)
+
+    cost = 0
+    i = 0
+    tour = [i]
+    index.remove(i)
+
+    while index.size:
+        # Nearest unvisited city, then remove it from the index
+        j, dist = index.nearest(coords[i])
+        index.remove(j)
+        tour.append(j)
+
+        # Add the cost, Euclidean distance
+        cost += np.sqrt(dist)
+        i = j
+
+    # Cost of returning home
+    cost += np.sqrt(((coords[i] - coords[0]) ** 2).sum())
+
+    print('Total cost:', cost)
+
+    return cost, tour
+
+
+def improve_tour(coords, tour: list, neighbors: int = 8, time_budget: float = 10.0, seg_max: int = 3):
+    """
+    Improve a tour with 2-opt and Or-opt local search. Candidate moves only join a city to one of its nearest
+    neighbors, taken from a grid spatial index. Don't-look bits keep the search on cities near recent changes: a city
+    is only revisited once an edge next to it has changed.
+
+    2-opt removes two edges and reconnects the tour by reversing the path between them. Or-opt moves a segment of up
+    to seg_max cities, in either orientation, to sit next to a neighbor of one of its ends.
+
+    Args:
+        coords: list or 2D np.array, city coordinates
+        tour: list, order of cities visited
+        neighbors: int, number of nearest neighbors considered per city. Optional, default 8
+        time_budget: float, seconds to spend improving. Optional, default 10
+        seg_max: int, longest segment moved by Or-opt. Optional, default 3
+
+    Returns:
+        cost: float, cost of the improved tour
+        tour: list, improved order of cities visited
+        trajectory: list of (seconds, cost) pairs, one per improving move
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    xs, ys = coords[:, 0].tolist(), coords[:, 1].tolist()
+    n = len(tour)
+
+    def dist(a, b):
+        return math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+    # Tour as an array, plus the position of each city in it
+    tour = np.array(tour, dtype=np.int64)
+    pos = np.empty(n, dtype=np.int64)
+    pos[tour] = np.arange(n)
+    nbrs = spatial.GridIndex(coords).knn(min(neighbors, n - 1)).tolist()
+
+    cost = sum(dist(tour[i], tour[(i + 1) % n]) for i in range(n))
+    begin = time.time()
+    trajectory = [(0.0, cost)]
+
+    # Cities without their don't-look bit set, waiting to be examined
+    queue = collections.deque(tour.tolist())
+    queued = [True] * n
+
+    def wake(*cities):
+        for c in cities:
+            if not queued[c]:
+                queued[c] = True
+                queue.append(c)
+
+    def reverse(i: int, j: int):
+        # Reverse the tour between positions i and j going forwards, or the complement if that is shorter
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j, length = (j + 1) % n, (i - 1) % n, n - length
+        idx = (i + np.arange(length)) % n
+        tour[idx] = tour[idx[::-1]]
+        pos[tour[idx]] = idx
+
+    def two_opt(a: int):
+        i = int(pos[a])
+        for step in (1, -1):
+            b = int(tour[(i + step) % n])
+            d_ab = dist(a, b)
+            for c in nbrs[a]:
+                d_ac = dist(a, c)
+                # Neighbors are sorted, so no later one can give a shorter new edge
+                if c < 0 or d_ac >= d_ab:
+                    break
+                j = int(pos[c])
+                d = int(tour[(j + step) % n])
+                if d == a:
+                    continue
+                gain = d_ab + dist(c, d) - d_ac - dist(b, d)
+                if gain > EPS:
+                    if step == 1:
+                        reverse(i + 1, j)
+                    else:
+                        reverse(j, i - 1)
+                    wake(a, b, c, d)
+                    return gain
+        return 0
+
+    def or_opt(a: int):
+        i = int(pos[a])
+        for length in range(1, min(seg_max, n - 3) + 1):
+            # Segment starting at a, and the cost saved by splicing it out
+            s1, se = a, int(tour[(i + length - 1) % n])
+            p, nx = int(tour[(i - 1) % n]), int(tour[(i + length) % n])
+            removed = dist(p, s1) + dist(se, nx) - dist(p, nx)
+            if removed <= EPS:
+                continue
+            for c in nbrs[s1] + nbrs[se]:
+                if c < 0 or (pos[c] - i) % n < length:
+                    continue
+                j = int(pos[c])
+                for u, v in ((c, int(tour[(j + 1) % n])), (int(tour[(j - 1) % n]), c)):
+                    if (pos[u] - i) % n < length or (pos[v] - i) % n < length:
+                        continue
+                    forward = dist(u, s1) + dist(se, v)
+                    backward = dist(u, se) + dist(s1, v)
+                    gain = removed - min(forward, backward) + dist(u, v)
+                    if gain > EPS:
+                        # Splice the segment out and back in after u
+                        t = np.roll(tour, -i)
+                        seg, rest = t[:length], t[length:]
+                        k = (int(pos[u]) - i) % n - length
+                        seg = seg if forward <= backward else seg[::-1]
+                        tour[:] = np.concatenate((rest[:k + 1], seg, rest[k + 1:]))
+                        pos[tour] = np.arange(n)
+                        wake(p, nx, s1, se, u, v)
+                        return gain
+        return 0
+
+    while queue and time.time() - begin < time_budget:
+        a = queue.popleft()
+        queued[a] = False
+        gain = two_opt(a) or or_opt(a)
+        if gain:
+            cost -= gain
+            trajectory.append((time.time() - begin, cost))
+
+    print('Improved cost:', cost, 'from', trajectory[0][1], 'in', time.time() - begin, 'seconds')
+
+    return cost, tour.tolist(), trajectory
+
+
 if __name__ == "__main__":
 
     tsp_g = read_input("nn.txt")
@@ -75,3 +253,9 @@ if __name__ == "__main__":
 
     cProfile.run('tsp_nn_heuristic(dist_matrix)')
 
+    cProfile.run('nn_cost, nn_tour = tsp_nn_tour(tsp_g)')
+
+    cProfile.run('best_cost, best_tour, _ = improve_tour(tsp_g, nn_tour, time_budget=60)')
+
+    cProfile.run('lower_bound.held_karp_bound(tsp_g, upper=best_cost)')
+
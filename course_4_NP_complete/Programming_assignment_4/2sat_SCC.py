@@ -1,4 +1,5 @@
-import time, glob
+import time, glob, json, multiprocessing, os, resource, signal
+import numpy as np
 from data_structures import graphs
 
 def read_2sat_input(src: str):
@@ -182,6 +183,405 @@ def check_2sat(g_in: graphs.Graph):
     return None
 
 
+def literal_ids(x):
+    """
+    Map signed variable identifiers (1-based, negative for not) to literal ids. Variable i gets ids 2(i-1) for the
+    positive literal and 2(i-1)+1 for the negated one, so negation is an xor with 1.
+
+    Args:
+        x: np.array of int, signed variable identifiers
+
+    Returns:
+        np.array of int, literal ids
+    """
+    return 2 * (np.abs(x) - 1) + (x < 0)
+
+
+def build_implication_csr(clauses, num_vars: int):
+    """
+    Build the implication graph of a 2-sat instance as compressed sparse row arrays over literal ids. Each clause
+    (A or B) adds the edges A' -> B and B' -> A.
+
+    Args:
+        clauses: 2D np.array of int, one clause per row, signed variable identifiers
+        num_vars: int, number of variables
+
+    Returns:
+        indptr: np.array, edges out of literal v are indices[indptr[v]:indptr[v + 1]]
+        indices: np.array, head literal of each edge
+        edge_clause: np.array, clause that produced each edge
+    """
+    a, b = literal_ids(clauses[:, 0]), literal_ids(clauses[:, 1])
+    m = len(clauses)
+    src = np.concatenate((a ^ 1, b ^ 1))
+    dst = np.concatenate((b, a))
+    clause = np.concatenate((np.arange(m), np.arange(m)))
+
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(2 * num_vars + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(src, minlength=2 * num_vars))
+    return indptr, dst[order], clause[order]
+
+
+def tarjan_scc(indptr, indices):
+    """
+    Compute strongly connected components in a single DFS pass using Tarjan's algorithm, implemented with an
+    explicit stack. Components are numbered in the order they complete, which is a reverse topological order of the
+    condensed graph.
+
+    Args:
+        indptr: np.array, CSR row pointers
+        indices: np.array, CSR column indices
+
+    Returns:
+        comp: list of int, component number of each vertex
+    """
+    indptr, indices = indptr.tolist(), indices.tolist()
+    n = len(indptr) - 1
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    comp = [-1] * n
+    stack = []
+    counter = 0
+    num_comps = 0
+
+    for s in range(n):
+        if index[s] != -1:
+            continue
+        index[s] = low[s] = counter
+        counter += 1
+        stack.append(s)
+        on_stack[s] = True
+        work = [[s, indptr[s]]]
+
+        while work:
+            frame = work[-1]
+            v, e = frame
+            if e < indptr[v + 1]:
+                # Next out-edge of v
+                frame[1] = e + 1
+                w = indices[e]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append([w, indptr[w]])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+            else:
+                # Done with v, pass its low-link up and close its component if it is a root
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        comp[w] = num_comps
+                        if w == v:
+                            break
+                    num_comps += 1
+    return comp
+
+
+def implication_path(indptr, indices, edge_clause, comp: list, start: int, goal: int):
+    """
+    Breadth-first search for a path between two literals within their strongly connected component
+
+    Args:
+        indptr: np.array, CSR row pointers
+        indices: np.array, CSR column indices
+        edge_clause: np.array, clause that produced each edge
+        comp: list of int, component number of each literal
+        start: int, literal id to start from
+        goal: int, literal id to reach
+
+    Returns:
+        list of int, clause indices along the path
+    """
+    via = {start: None}
+    queue = [start]
+    for v in queue:
+        if v == goal:
+            break
+        for e in range(indptr[v], indptr[v + 1]):
+            w = int(indices[e])
+            if w not in via and comp[w] == comp[start]:
+                via[w] = (v, e)
+                queue.append(w)
+
+    path = []
+    v = goal
+    while via[v] is not None:
+        v, e = via[v]
+        path.append(int(edge_clause[e]))
+    path.reverse()
+    return path
+
+
+def preprocess_2sat(clauses, num_vars: int, verbose: bool = True):
+    """
+    Shrink a 2-sat instance before building its implication graph. Repeats until nothing changes:
+        1. Drop satisfied clauses, and turn clauses with a false literal into unit clauses of the other literal
+        2. Drop tautologies (X or X') and duplicate clauses
+        3. Set literals true if they appear in a unit clause (X or X), or are pure, appearing only in one polarity
+    The surviving variables are then renumbered densely.
+
+    Args:
+        clauses: 2D np.array of int, one clause per row, signed variable identifiers
+        num_vars: int, number of variables
+        verbose: bool, print the outcome of the reduction. Optional, default True
+
+    Returns:
+        reduced: 2D np.array of int, renumbered clauses of the reduced instance. None if a conflict was found,
+            in which case the instance is unsatisfiable
+        old_vars: np.array of int, original identifier of each renumbered variable, variable i at index i - 1
+        fixed: np.array of int8, value fixed for each original variable, variable i at index i - 1. 1 for true, 0 for
+            false, -1 if left to the reduced instance or unconstrained
+    """
+    lits = np.stack((literal_ids(clauses[:, 0]), literal_ids(clauses[:, 1])), axis=1)
+    val = np.full(2 * num_vars, -1, dtype=np.int8)
+    ids = np.arange(2 * num_vars)
+    conflict = False
+
+    while True:
+        # Drop satisfied clauses, replace false literals by the other literal
+        va = val[lits]
+        keep = ~(va == 1).any(axis=1)
+        lits, va = lits[keep], va[keep]
+        false_a, false_b = va[:, 0] == 0, va[:, 1] == 0
+        if (false_a & false_b).any():
+            conflict = True
+            break
+        lits[false_a, 0] = lits[false_a, 1]
+        lits[false_b, 1] = lits[false_b, 0]
+
+        # Drop tautologies and duplicates
+        lits.sort(axis=1)
+        lits = lits[lits[:, 0] != lits[:, 1] ^ 1]
+        keys = np.unique(lits[:, 0] * 2 * num_vars + lits[:, 1])
+        lits = np.stack((keys // (2 * num_vars), keys % (2 * num_vars)), axis=1)
+
+        # Literals forced by unit clauses, or safe to set as they are pure
+        unit = lits[lits[:, 0] == lits[:, 1], 0]
+        count = np.bincount(lits.ravel(), minlength=2 * num_vars)
+        pure = np.flatnonzero((count > 0) & (count[ids ^ 1] == 0))
+        new = np.concatenate((unit, pure))
+        if not len(new):
+            break
+
+        mark = np.zeros(2 * num_vars, dtype=bool)
+        mark[new] = True
+        if (mark[0::2] & mark[1::2]).any():
+            conflict = True
+            break
+        val[new] = 1
+        val[new ^ 1] = 0
+
+    fixed = val[0::2]
+    if conflict:
+        if verbose:
+            print("Preprocessing found a conflict, unsatisfiable")
+        return None, None, fixed
+
+    # Renumber the surviving variables densely
+    old_vars, new_vars = np.unique(lits // 2, return_inverse=True)
+    reduced = (new_vars.reshape(-1, 2) + 1) * np.where(lits & 1, -1, 1)
+    if verbose:
+        print("Preprocessing reduced", len(clauses), "clauses to", len(reduced), "and", num_vars, "variables to",
+              len(old_vars))
+    return reduced, old_vars + 1, fixed
+
+
+def solve_2sat(clauses: list, num_vars: int = None, preprocess: bool = False, verbose: bool = True):
+    """
+    Solve a 2-sat instance. Builds one implication graph over literal ids and finds its strongly connected
+    components in a single pass. The instance is unsatisfiable iff some X and X' share a component. Otherwise, since
+    Tarjan's numbering is a reverse topological order, setting X true iff comp[X] < comp[X'] satisfies every clause.
+
+    With preprocessing, the graph is built for the reduced instance from preprocess_2sat and the assignment is mapped
+    back to the original variables. Unsatisfiable instances are re-solved in full so the core refers to the original
+    clauses.
+
+    Args:
+        clauses: list of lists or 2D np.array, each clause a pair of signed variable identifiers, negative for not
+        num_vars: int, number of variables. Optional, default is the largest identifier
+        preprocess: bool, shrink the instance with preprocess_2sat first. Optional, default False
+        verbose: bool, let preprocess_2sat print the outcome of the reduction. Optional, default True
+
+    Returns:
+        satisfiable: bool
+        result: if satisfiable, np.array of bool with the value of variable i at index i - 1. Otherwise the indices
+            of clauses forming an unsatisfiable core, the implication chains X -> X' and X' -> X for some X.
+    """
+    clauses = np.asarray(clauses, dtype=np.int64).reshape(-1, 2)
+    if num_vars is None:
+        num_vars = int(np.abs(clauses).max()) if len(clauses) else 0
+
+    if preprocess:
+        reduced, old_vars, fixed = preprocess_2sat(clauses, num_vars, verbose)
+        if reduced is not None:
+            satisfiable, result = solve_2sat(reduced, len(old_vars))
+            if satisfiable:
+                assignment = fixed == 1
+                assignment[old_vars - 1] = result
+                return True, assignment
+        return solve_2sat(clauses, num_vars)
+
+    indptr, indices, edge_clause = build_implication_csr(clauses, num_vars)
+    comp = np.array(tarjan_scc(indptr, indices), dtype=np.int64)
+
+    pos, neg = comp[0::2], comp[1::2]
+    conflict = np.flatnonzero(pos == neg)
+    if len(conflict):
+        x = 2 * int(conflict[0])
+        core = implication_path(indptr, indices, edge_clause, comp, x, x ^ 1)
+        core += implication_path(indptr, indices, edge_clause, comp, x ^ 1, x)
+        return False, sorted(set(core))
+
+    return True, pos < neg
+
+
+def read_2sat_array(src: str):
+    """
+    Read txt file input for the 2-sat problem straight into an array, see read_2sat_input for the format. The header
+    gives the number of variables, so variables declared but absent from every clause are still counted.
+
+    Args:
+        src: str, file path for the input
+
+    Returns:
+        clauses: 2D np.array of int, one clause per row
+        num_vars: int, number of variables, the header count or the largest identifier if that is larger
+    """
+    with open(src) as file:
+        header = int(file.readline().split()[0])
+    clauses = np.loadtxt(src, dtype=np.int64, skiprows=1, ndmin=2).reshape(-1, 2)
+    return clauses, max(header, int(np.abs(clauses).max()) if len(clauses) else 0)
+
+
+def instance_files(source: str):
+    """
+    List the instance files for a batch. The source is either a directory, in which case all .txt files in it are
+    used, or a manifest file listing one instance path per line, relative to the manifest.
+
+    Args:
+        source: str, directory or manifest file path
+
+    Returns:
+        list of str, instance file paths
+    """
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "*.txt")))
+    base = os.path.dirname(source)
+    with open(source) as file:
+        return [os.path.join(base, line.strip()) for line in file if line.strip()]
+
+
+def batch_worker_init(mem_cap_mb: int):
+    """
+    Pool worker initializer. Caps the address space of the worker so a runaway instance fails with MemoryError
+    rather than taking down the machine.
+
+    Args:
+        mem_cap_mb: int, memory cap per worker in MB. None for no cap
+
+    Returns:
+        None
+    """
+    if mem_cap_mb:
+        cap = mem_cap_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+    return None
+
+
+def instance_timeout(signum, frame):
+    raise TimeoutError
+
+
+def solve_instance(task: tuple):
+    """
+    Pool worker solving a single 2-sat instance file, under a wall clock timeout
+
+    Args:
+        task: tuple, (file path, timeout in seconds or None, preprocess flag, include assignment flag)
+
+    Returns:
+        dict, result record with the file, status (sat, unsat, timeout, memory or error), timings and either the
+        assignment as a string of 0/1 per variable or the unsat core clause indices
+    """
+    src, timeout, preprocess, with_assignment = task
+    record = {"file": src}
+    start = begin = time.time()
+
+    signal.signal(signal.SIGALRM, instance_timeout)
+    if timeout:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        clauses, num_vars = read_2sat_array(src)
+        record["read_seconds"] = time.time() - begin
+
+        begin = time.time()
+        satisfiable, result = solve_2sat(clauses, num_vars=num_vars, preprocess=preprocess, verbose=False)
+        record["solve_seconds"] = time.time() - begin
+        record["status"] = "sat" if satisfiable else "unsat"
+        if satisfiable and with_assignment:
+            record["assignment"] = (result.astype(np.uint8) + ord("0")).tobytes().decode()
+        elif not satisfiable:
+            record["core"] = result
+    except TimeoutError:
+        record["status"] = "timeout"
+    except MemoryError:
+        record["status"] = "memory"
+    except Exception as err:
+        record["status"] = "error"
+        record["error"] = repr(err)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+    record["total_seconds"] = time.time() - start
+    return record
+
+
+def batch_solve(source: str, output: str, workers: int = None, timeout: float = None, mem_cap_mb: int = None,
+                preprocess: bool = True, with_assignment: bool = True):
+    """
+    Solve many 2-sat instances across a process pool. Results are written to a JSON-lines file, one record per
+    instance, as each instance finishes.
+
+    Args:
+        source: str, directory of .txt instances or a manifest file listing instance paths
+        output: str, file path for the JSON-lines results
+        workers: int, number of worker processes. Optional, default is the number of cores
+        timeout: float, wall clock limit per instance in seconds. Optional, default no limit
+        mem_cap_mb: int, memory cap per worker in MB. Optional, default no cap
+        preprocess: bool, run preprocess_2sat before solving. Optional, default True
+        with_assignment: bool, include satisfying assignments in the output. Optional, default True
+
+    Returns:
+        dict, count of instances per status
+    """
+    files = instance_files(source)
+    tasks = [(f, timeout, preprocess, with_assignment) for f in files]
+    counts = {}
+    begin = time.time()
+
+    with multiprocessing.Pool(workers, initializer=batch_worker_init, initargs=(mem_cap_mb,)) as pool, \
+            open(output, "w") as out:
+        for record in pool.imap_unordered(solve_instance, tasks):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+            print(record["file"], record["status"], "in", record["total_seconds"], "seconds")
+
+    print("Solved", len(files), "instances in", time.time() - begin, "seconds:", counts)
+    return counts
+
+
 if __name__ == "__main__":
 
     for file in glob.glob("*.txt"):
@@ -202,7 +602,10 @@ if __name__ == "__main__":
 
         check_2sat(im_graph)
 
+        begin = time.time()
+        satisfiable, _ = solve_2sat(two_sat_in, preprocess=True)
+        print("Single pass solver ran in", time.time() - begin, "seconds:", "Satisfiable" if satisfiable else "Unsatisfiable!")
+        print('\n')
 
-
-
-
+    # Solve all instances again as a batch across a process pool
+    batch_solve(".", "2sat_results.jsonl", timeout=600)
@@ -0,0 +1,150 @@
+"""
+Distance computations between cities given as 2D coordinates.
+
+Dense distance matrices are built with NumPy broadcasting one block of rows at a time, so temporaries stay bounded by
+the block size. Storage can be float32 to halve memory, or a condensed upper triangle holding each pair once. For
+instances too large for any dense matrix, LazyDistances computes rows on demand.
+"""
+import numpy as np
+
+# Number of rows computed per broadcasting pass
+BLOCK_ROWS = 1024
+
+
+def pair_dist(p, q, squared: bool = False):
+    """
+    Euclidean distances between two sets of points
+
+    Args:
+        p: 2D np.array, coordinates of the first set, one row per point
+        q: 2D np.array, coordinates of the second set, one row per point
+        squared: bool, return squared distances to avoid computing roots. Optional, default False
+
+    Returns:
+        2D np.array of distances, rows for p and columns for q
+    """
+    sqr = ((p[:, None, :] - q[None, :, :]) ** 2).sum(axis=-1)
+    if squared:
+        return sqr
+    return np.sqrt(sqr)
+
+
+def dist_matrix(coords, squared: bool = False, dtype=np.float64, block: int = BLOCK_ROWS):
+    """
+    Dense matrix of Euclidean distances between all cities, built one block of rows at a time. Each block only
+    computes the columns from its first row on and mirrors them below the diagonal, so each pair is computed once.
+
+    Args:
+        coords: list or 2D np.array, city coordinates
+        squared: bool, store squared distances. Optional, default False
+        dtype: np dtype of the output, optional, default float64. float32 halves memory.
+        block: int, number of rows per broadcasting pass. Optional
+
+    Returns:
+        D: 2D np.array, nxn distances
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    n = len(coords)
+    D = np.empty((n, n), dtype=dtype)
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        rows = pair_dist(coords[lo:hi], coords[lo:], squared)
+        D[lo:hi, lo:] = rows
+        D[hi:, lo:hi] = rows[:, hi - lo:].T
+    return D
+
+
+def condensed_index(i, j, n: int):
+    """
+    Position of the pair (i, j) in a condensed upper-triangle distance vector
+
+    Args:
+        i: int or np.array, index of the first city
+        j: int or np.array, index of the second city, must differ from i
+        n: int, number of cities
+
+    Returns:
+        int or np.array, index into the condensed vector
+    """
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    return n * i - i * (i + 1) // 2 + (j - i - 1)
+
+
+def condensed_dist(coords, squared: bool = False, dtype=np.float64, block: int = BLOCK_ROWS):
+    """
+    Condensed upper triangle of the distance matrix. Each pair i < j is stored once, in row-major order, halving the
+    memory of the dense matrix. Look up entries with condensed_index.
+
+    Args:
+        coords: list or 2D np.array, city coordinates
+        squared: bool, store squared distances. Optional, default False
+        dtype: np dtype of the output, optional, default float64
+        block: int, number of rows per broadcasting pass. Optional
+
+    Returns:
+        c: np.array of length n(n-1)/2 with the pairwise distances
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    n = len(coords)
+    c = np.empty(n * (n - 1) // 2, dtype=dtype)
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        # Only columns right of the diagonal are needed for this block of rows
+        rows = pair_dist(coords[lo:hi], coords[lo + 1:], squared)
+        for i in range(lo, hi):
+            start = condensed_index(i, i + 1, n)
+            c[start:start + n - i - 1] = rows[i - lo, i - lo:]
+    return c
+
+
+class LazyDistances:
+    """
+    Distance matrix whose rows are computed on demand from the city coordinates. Memory is O(n), so this stands in
+    for a dense matrix on instances too large to store one. Supports D.shape, len(D), D[i] and D[i, cols].
+    """
+    def __init__(self, coords, squared: bool = False, dtype=np.float64):
+        """
+        Constructor
+
+        Args:
+            coords: list or 2D np.array, city coordinates
+            squared: bool, produce squared distances. Optional, default False
+            dtype: np dtype of the produced rows, optional, default float64
+        """
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.squared = squared
+        self.dtype = dtype
+        self.shape = (len(self.coords), len(self.coords))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def row(self, i: int):
+        """
+        Distances from city i to all cities
+
+        Args:
+            i: int, index of the city
+
+        Returns:
+            np.array of distances
+        """
+        return pair_dist(self.coords[i:i + 1], self.coords, self.squared)[0].astype(self.dtype, copy=False)
+
+    def rows(self, idx):
+        """
+        Distances from a set of cities to all cities
+
+        Args:
+            idx: np.array, indices of the cities
+
+        Returns:
+            2D np.array of distances, one row per entry in idx
+        """
+        return pair_dist(self.coords[idx], self.coords, self.squared).astype(self.dtype, copy=False)
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            i, cols = key
+            return self.row(i)[cols]
+        return self.row(key)
@@ -0,0 +1,408 @@
+"""
+Held-Karp lower bound for the TSP, from minimum 1-trees with subgradient optimization.
+
+A 1-tree is a spanning tree on all cities but one, plus the two cheapest edges from the remaining city. Every tour
+is a 1-tree, so the minimum 1-tree bounds the optimal tour from below. Adding a penalty pi to each city's edges
+leaves the optimal tour unchanged (it shifts by 2 * sum(pi)) but changes the minimum 1-tree; subgradient
+optimization tunes pi to push cities towards degree 2, tightening the bound.
+
+The subgradient iterations run Kruskal's algorithm over an array-backed candidate graph of k-nearest-neighbor edges,
+which is fast but only exact when the candidate graph holds the penalized minimum 1-tree. Candidate bounds are
+checked with a dense Prim's over distance rows generated on the fly whenever the step is halved, and the edges it
+finds join the candidate graph. The final bound is recomputed the same way, so the reported value is always valid.
+"""
+import numpy as np
+from data_structures import geometry, spatial
+
+# Max subgradient iterations for the Held-Karp bound
+HK_ITERATIONS = 1000
+
+# Initial scale of the Polyak step
+HK_INITIAL_SCALE = 1.0
+
+# Iterations without improvement before the step scale is halved
+HK_PATIENCE = 10
+
+# Step scale below which the subgradient search stops
+HK_MIN_SCALE = 1e-3
+
+# Max number of entries in the distance blocks used to connect the candidate graph
+CONNECT_BLOCK = 1 << 22
+
+
+def knn_edges(coords, k: int = 8):
+    """
+    Undirected candidate edges joining each city to its k nearest neighbors
+
+    Args:
+        coords: 2D np.array, city coordinates
+        k: int, number of neighbors per city. Optional, default 8
+
+    Returns:
+        u: np.array of int, first endpoint of each edge, the smaller index
+        v: np.array of int, second endpoint of each edge
+        d: np.array, length of each edge
+    """
+    n = len(coords)
+    nbrs = spatial.GridIndex(coords).knn(min(k, n - 1))
+    u = np.repeat(np.arange(n), nbrs.shape[1])
+    v = nbrs.ravel()
+    u, v = u[v >= 0], v[v >= 0]
+
+    # Each edge once, smaller endpoint first
+    keys = np.unique(np.minimum(u, v) * n + np.maximum(u, v))
+    u, v = keys // n, keys % n
+    d = np.sqrt(((coords[u] - coords[v]) ** 2).sum(axis=1))
+    return u, v, d
+
+
+def component_labels(n: int, u, v):
+    """
+    Connected component of every city in a graph, by union-find with path halving
+
+    Args:
+        n: int, number of cities
+        u: np.array of int, first endpoint of each edge
+        v: np.array of int, second endpoint of each edge
+
+    Returns:
+        np.array of int, root city of the component holding each city
+    """
+    parent = list(range(n))
+    for a, b in zip(u.tolist(), v.tolist()):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        while parent[b] != b:
+            parent[b] = parent[parent[b]]
+            b = parent[b]
+        if a != b:
+            parent[a] = b
+    for a in range(n):
+        parent[a] = parent[parent[a]]
+    labels = np.array(parent)
+    # Point every city straight at its root
+    while True:
+        nxt = labels[labels]
+        if np.array_equal(nxt, labels):
+            return labels
+        labels = nxt
+
+
+def add_edges(coords, u, v, a, b):
+    """
+    Merge new edges into a candidate graph, dropping duplicates
+
+    Args:
+        coords: 2D np.array, city coordinates
+        u: np.array of int, first endpoint of each edge, the smaller one
+        v: np.array of int, second endpoint of each edge
+        a: np.array of int, one endpoint of each new edge
+        b: np.array of int, other endpoint of each new edge
+
+    Returns:
+        u, v, d: the edges of the merged graph, each once with the smaller endpoint first
+    """
+    n = len(coords)
+    keys = np.unique(np.concatenate((u * n + v, np.minimum(a, b) * n + np.maximum(a, b))))
+    u, v = keys // n, keys % n
+    return u, v, np.sqrt(((coords[u] - coords[v]) ** 2).sum(axis=1))
+
+
+def connect_components(coords, u, v, d):
+    """
+    Add edges to a candidate graph until it is connected. A k-nearest-neighbor graph falls apart on clustered
+    inputs, and a 1-tree cannot span it. Every city outside the largest component is joined to its nearest city in
+    another component, which gives the subgradient search several crossing edges to choose from, and the process is
+    repeated until a single component remains. Distances are computed in blocks of rows.
+
+    Args:
+        coords: 2D np.array, city coordinates
+        u: np.array of int, first endpoint of each edge
+        v: np.array of int, second endpoint of each edge
+        d: np.array, length of each edge
+
+    Returns:
+        u, v, d: the edges of the connected candidate graph, each once with the smaller endpoint first
+    """
+    n = len(coords)
+    block = max(1, CONNECT_BLOCK // n)
+    while True:
+        labels = component_labels(n, u, v)
+        roots, sizes = np.unique(labels, return_counts=True)
+        if len(roots) == 1:
+            return u, v, d
+
+        # Nearest city in another component, for each city outside the largest component
+        rest = np.flatnonzero(labels != roots[sizes.argmax()])
+        near = np.empty(len(rest), dtype=np.int64)
+        for lo in range(0, len(rest), block):
+            rows = rest[lo:lo + block]
+            dist = geometry.pair_dist(coords[rows], coords, squared=True)
+            dist[labels[rows][:, None] == labels[None, :]] = np.inf
+            near[lo:lo + block] = dist.argmin(axis=1)
+
+        u, v, d = add_edges(coords, u, v, rest, near)
+
+
+def candidate_one_tree(n: int, u, v, d, pi):
+    """
+    Minimum 1-tree on a candidate graph with penalized edge weights d + pi[u] + pi[v]. City 0 is the special city.
+    The tree on the other cities is built with Kruskal's algorithm over the presorted edge array, using a union-find
+    with path halving, and stops once it spans.
+
+    Args:
+        n: int, number of cities
+        u: np.array of int, first endpoint of each edge
+        v: np.array of int, second endpoint of each edge
+        d: np.array, length of each edge
+        pi: np.array, penalty per city
+
+    Returns:
+        bound: float, penalized 1-tree weight less 2 * sum(pi)
+        degree: np.array of int, degree of each city in the 1-tree
+        spans: bool, whether the candidate graph yielded a spanning 1-tree
+    """
+    w = d + pi[u] + pi[v]
+    degree = np.zeros(n, dtype=np.int64)
+    total = 0.0
+
+    # Kruskal on the edges not touching the special city
+    inner = np.flatnonzero((u != 0) & (v != 0))
+    order = inner[np.argsort(w[inner], kind="stable")]
+    us, vs, ws = u[order].tolist(), v[order].tolist(), w[order].tolist()
+    parent = list(range(n))
+    accepted = 0
+    for a, b, c in zip(us, vs, ws):
+        ra = a
+        while parent[ra] != ra:
+            parent[ra] = parent[parent[ra]]
+            ra = parent[ra]
+        rb = b
+        while parent[rb] != rb:
+            parent[rb] = parent[parent[rb]]
+            rb = parent[rb]
+        if ra != rb:
+            parent[ra] = rb
+            total += c
+            degree[a] += 1
+            degree[b] += 1
+            accepted += 1
+            if accepted == n - 2:
+                break
+
+    # Two cheapest edges from the special city
+    outer = np.flatnonzero((u == 0) | (v == 0))
+    outer = outer[np.argsort(w[outer], kind="stable")[:2]]
+    total += w[outer].sum()
+    degree[0] += len(outer)
+    np.add.at(degree, np.where(u[outer] == 0, v[outer], u[outer]), 1)
+
+    spans = accepted == n - 2 and len(outer) == 2
+    return total - 2 * pi.sum(), degree, spans
+
+
+def dense_one_tree(coords, pi, return_edges: bool = False):
+    """
+    Exact minimum 1-tree with penalized edge weights, using a dense Prim's over distance rows generated on the fly.
+    Cities outside the tree are kept packed at the front of the working arrays, so each step only computes distances
+    to those. O(n^2) time and O(n) memory. City 0 is the special city.
+
+    Args:
+        coords: 2D np.array, city coordinates
+        pi: np.array, penalty per city
+        return_edges: bool, also return the edges of the 1-tree. Optional, default False
+
+    Returns:
+        bound: float, penalized 1-tree weight less 2 * sum(pi)
+        degree: np.array of int, degree of each city in the 1-tree
+        edges: 2D np.array of int, one row (a, b) per 1-tree edge. Only if return_edges is True
+    """
+    n = len(coords)
+    degree = np.zeros(n, dtype=np.int64)
+    edges = []
+
+    # Prim's on every city but the special one. Working arrays hold the cities outside the tree in their first m
+    # entries, with the best connection to the tree for each.
+    rest = np.arange(1, n)
+    rx, ry, rpi = coords[rest, 0].copy(), coords[rest, 1].copy(), pi[rest].copy()
+    best = np.full(n - 1, np.inf)
+    best[0] = 0
+    link = np.full(n - 1, -1, dtype=np.int64)
+    total = 0.0
+    for m in range(n - 1, 0, -1):
+        k = int(best[:m].argmin())
+        x, xx, xy, xpi = int(rest[k]), rx[k], ry[k], rpi[k]
+        total += best[k]
+        if link[k] >= 0:
+            degree[x] += 1
+            degree[link[k]] += 1
+            edges.append((x, int(link[k])))
+
+        # Swap the new tree city out of the working range
+        last = m - 1
+        for arr in (rest, rx, ry, rpi, best, link):
+            arr[k], arr[last] = arr[last], arr[k]
+
+        row = np.sqrt((rx[:last] - xx) ** 2 + (ry[:last] - xy) ** 2) + rpi[:last] + xpi
+        closer = row < best[:last]
+        best[:last][closer] = row[closer]
+        link[:last][closer] = x
+
+    # Two cheapest edges from the special city
+    row = geometry.pair_dist(coords[:1], coords)[0] + pi + pi[0]
+    row[0] = np.inf
+    two = np.argsort(row, kind="stable")[:2]
+    total += row[two].sum()
+    degree[0] += 2
+    degree[two] += 1
+    if return_edges:
+        edges += [(0, int(t)) for t in two]
+        return total - 2 * pi.sum(), degree, np.array(edges, dtype=np.int64)
+    return total - 2 * pi.sum(), degree
+
+
+def dense_candidates(coords, u, v, pi):
+    """
+    Exact 1-tree bound for the given penalties, with the edges of the dense 1-tree added to the candidate graph
+
+    Args:
+        coords: 2D np.array, city coordinates
+        u: np.array of int, first endpoint of each candidate edge
+        v: np.array of int, second endpoint of each candidate edge
+        pi: np.array, penalty per city
+
+    Returns:
+        bound: float, penalized 1-tree weight less 2 * sum(pi)
+        u, v, d: the candidate graph with the 1-tree edges added
+    """
+    bound, _, edges = dense_one_tree(coords, pi, return_edges=True)
+    return (bound, *add_edges(coords, u, v, edges[:, 0], edges[:, 1]))
+
+
+def subgradient_ascent(coords, u, v, d, pi, groups, upper: float = None, iterations: int = HK_ITERATIONS,
+                       exact: bool = True):
+    """
+    Subgradient optimization of the 1-tree bound, with one penalty shift per group of cities added to pi. With a
+    group per city this is the usual Held-Karp search; with a group per cluster it moves whole clusters at once,
+    which a per-city search only does over many iterations. Polyak steps towards an upper bound are taken along a
+    blend of the current and previous subgradients. The step scale is halved after HK_PATIENCE iterations without
+    improvement and the search stops once it falls below HK_MIN_SCALE. At each halving the best penalties are checked
+    against the dense 1-tree, whose edges join the candidate graph when it found a cheaper 1-tree.
+
+    Args:
+        coords: 2D np.array, city coordinates
+        u: np.array of int, first endpoint of each candidate edge
+        v: np.array of int, second endpoint of each candidate edge
+        d: np.array, length of each candidate edge
+        pi: np.array, starting penalty per city
+        groups: np.array of int, group of each city, numbered from 0
+        upper: float, length of a known tour, used to size the steps. Optional
+        iterations: int, max number of iterations. Optional, default HK_ITERATIONS
+        exact: bool, score the final penalties with the dense 1-tree. Optional, default True
+
+    Returns:
+        bound: float, best bound found
+        pi: np.array, penalty per city giving the bound
+        u, v, d: the candidate graph, with any edges added during the search
+    """
+    n = len(coords)
+    size = int(groups.max()) + 1
+    best, best_pi = -np.inf, pi.copy()
+    valid, valid_pi = dense_one_tree(coords, pi)[0], pi.copy()
+    step_scale = HK_INITIAL_SCALE
+    stall = 0
+    g_prev = None
+
+    for _ in range(iterations):
+        bound, degree, spans = candidate_one_tree(n, u, v, d, pi)
+        if not spans:
+            bound, degree = dense_one_tree(coords, pi)
+        if bound > best + 1e-9 * abs(bound):
+            best, best_pi, stall = bound, pi.copy(), 0
+        else:
+            stall += 1
+            if stall >= HK_PATIENCE:
+                # Halve the step after a run without progress, and stop once steps are negligible
+                step_scale /= 2
+                stall = 0
+                if step_scale < HK_MIN_SCALE:
+                    break
+
+                # A candidate 1-tree can beat the true one when the graph misses an edge, so check the best
+                # penalties against the dense 1-tree and restart from there
+                checked, u, v, d = dense_candidates(coords, u, v, best_pi)
+                if checked > valid:
+                    valid, valid_pi = checked, best_pi
+                if checked < best - 1e-9 * abs(best):
+                    best, best_pi = valid, valid_pi
+                pi, g_prev = best_pi.copy(), None
+                continue
+
+        # Once every group has total degree 2 per city, no shift of the groups improves the bound, unless the
+        # candidate graph missed an edge of the 1-tree
+        g = np.bincount(groups, weights=degree - 2, minlength=size)
+        if not g.any():
+            checked, u, v, d = dense_candidates(coords, u, v, pi)
+            if checked > valid:
+                valid, valid_pi = checked, pi.copy()
+            if checked >= bound - 1e-9 * abs(bound):
+                break
+            best, best_pi, g_prev = valid, valid_pi, None
+            continue
+
+        # Step along a blend of the current and previous subgradients, which damps zig-zagging
+        direction = g if g_prev is None else 0.7 * g + 0.3 * g_prev
+        g_prev = g
+        target = upper if upper is not None else 1.05 * best
+        step = step_scale * max(target - bound, 1e-12 * abs(target)) / (direction @ direction)
+        pi = pi + step * direction[groups]
+
+    if exact:
+        best, _ = dense_one_tree(coords, best_pi)
+        if valid > best:
+            best, best_pi = valid, valid_pi
+    return best, best_pi, u, v, d
+
+
+def held_karp_bound(coords, upper: float = None, k: int = 8, iterations: int = HK_ITERATIONS, exact: bool = True):
+    """
+    Held-Karp lower bound on the optimal tour length. Penalties are tuned by subgradient optimization over 1-trees
+    of the k-nearest-neighbor candidate graph, made connected with connect_components and holding every edge at the
+    special city. On clustered inputs the penalties of whole clusters must move together, so the search first
+    shifts one penalty per component of the k-nearest-neighbor graph, then tunes them city by city. See
+    subgradient_ascent for the step schedule.
+
+    Args:
+        coords: list or 2D np.array, city coordinates
+        upper: float, length of a known tour, used to size the steps and report the gap. Optional
+        k: int, nearest neighbors per city in the candidate graph. Optional, default 8
+        iterations: int, max number of subgradient iterations. Optional, default HK_ITERATIONS
+        exact: bool, score the final penalties with the dense 1-tree, making the bound valid even where the candidate
+            graph misses a 1-tree edge. Optional, default True
+
+    Returns:
+        bound: float, lower bound on the optimal tour length
+        pi: np.array, penalty per city giving the bound
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    n = len(coords)
+    pi = np.zeros(n)
+    if n < 3:
+        return 2 * float(geometry.pair_dist(coords[:1], coords).max()) if n == 2 else 0.0, pi
+
+    # Every edge at the special city is a candidate, as a large penalty gap can favour any of them
+    u, v, d = knn_edges(coords, k)
+    _, clusters = np.unique(component_labels(n, u, v), return_inverse=True)
+    u, v, d = connect_components(coords, u, v, d)
+    u, v, d = add_edges(coords, u, v, np.zeros(n - 1, dtype=np.int64), np.arange(1, n))
+
+    # Shift whole clusters of the candidate graph first, then tune the penalties city by city
+    if clusters.max() > 0:
+        _, pi, u, v, d = subgradient_ascent(coords, u, v, d, pi, clusters, upper, iterations, exact)
+    best, best_pi, u, v, d = subgradient_ascent(coords, u, v, d, pi, np.arange(n), upper, iterations, exact)
+
+    print('Lower bound:', best)
+    if upper is not None and best > 0:
+        print('Tour cost:', upper, ', gap at most', 100 * (upper - best) / best, '%')
+    return best, best_pi
@@ -0,0 +1,215 @@
+"""
+Uniform grid spatial index over 2D city coordinates.
+
+Cities are bucketed into square cells and stored cell by cell in a single array, with a start offset and live count
+per cell. Deletion swaps a city to the end of its cell's live range, so it is O(1) and memory stays O(n). Nearest
+neighbor queries scan square windows of cells around the query, doubling the window until no unscanned cell can hold
+a closer city. When most cities have been deleted the grid is rebuilt over the survivors to keep cells dense.
+"""
+import numpy as np
+
+# Target number of cities per grid cell
+CELL_LOAD = 2
+
+
+class GridIndex:
+    """
+    Uniform grid spatial index supporting deletion and nearest neighbor queries. Ties in distance are broken in
+    favour of the lowest city index.
+    """
+    def __init__(self, coords):
+        """
+        Constructor
+
+        Args:
+            coords: list or 2D np.array, city coordinates
+        """
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.alive = np.ones(len(self.coords), dtype=bool)
+        self.size = len(self.coords)
+        self.build(np.arange(len(self.coords)))
+
+    def build(self, idx):
+        """
+        (Re)build the grid over a set of cities
+
+        Args:
+            idx: np.array, indices of the cities to hold in the grid
+
+        Returns:
+            None
+        """
+        pts = self.coords[idx]
+        self.built_size = len(idx)
+        self.lo = pts.min(axis=0) if len(idx) else np.zeros(2)
+        span = np.maximum(pts.max(axis=0) - self.lo, 1e-12) if len(idx) else np.ones(2)
+
+        # Square cells sized for CELL_LOAD cities each on average
+        self.cell = max(np.sqrt(span[0] * span[1] * CELL_LOAD / max(len(idx), 1)), span.max() / max(len(idx), 1))
+        self.shape = np.maximum(np.ceil(span / self.cell).astype(np.int64), 1)
+
+        cells = self.cell_of(pts)
+        order = np.argsort(cells, kind="stable")
+        self.order = idx[order]
+        self.count = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        self.start = np.concatenate(([0], np.cumsum(self.count)[:-1]))
+        self.cells = np.zeros(len(self.coords), dtype=np.int64)
+        self.cells[self.order] = cells[order]
+        self.pos = np.zeros(len(self.coords), dtype=np.int64)
+        self.pos[self.order] = np.arange(len(idx))
+        return None
+
+    def cell_xy(self, pts):
+        """
+        Grid column and row holding each point, clipped to the grid
+
+        Args:
+            pts: 2D np.array, point coordinates
+
+        Returns:
+            2D np.array of int, (column, row) per point
+        """
+        return np.clip(((pts - self.lo) // self.cell).astype(np.int64), 0, self.shape - 1)
+
+    def cell_of(self, pts):
+        """
+        Flat cell id holding each point
+
+        Args:
+            pts: 2D np.array, point coordinates
+
+        Returns:
+            np.array of int, cell id per point
+        """
+        xy = self.cell_xy(pts)
+        return xy[:, 0] * self.shape[1] + xy[:, 1]
+
+    def remove(self, p: int):
+        """
+        Delete a city from the index, by swapping it to the end of its cell's live range
+
+        Args:
+            p: int, index of the city
+
+        Returns:
+            None
+        """
+        if not self.alive[p]:
+            return None
+        c = self.cells[p]
+        i = self.pos[p]
+        last = self.start[c] + self.count[c] - 1
+        q = self.order[last]
+        self.order[i], self.order[last] = q, p
+        self.pos[q], self.pos[p] = i, last
+        self.count[c] -= 1
+        self.alive[p] = False
+        self.size -= 1
+
+        # Keep cells dense as the index empties out
+        if 0 < self.size < self.built_size // 4:
+            self.build(np.flatnonzero(self.alive))
+        return None
+
+    def window(self, cx: int, cy: int, r: int):
+        """
+        Live cities in the square window of cells within r of cell (cx, cy)
+
+        Args:
+            cx: int, column of the center cell
+            cy: int, row of the center cell
+            r: int, window radius in cells
+
+        Returns:
+            np.array, indices of the live cities in the window
+        """
+        xs = np.arange(max(cx - r, 0), min(cx + r, self.shape[0] - 1) + 1)
+        ys = np.arange(max(cy - r, 0), min(cy + r, self.shape[1] - 1) + 1)
+        cells = (xs[:, None] * self.shape[1] + ys[None, :]).ravel()
+        cells = cells[self.count[cells] > 0]
+        if not len(cells):
+            return cells
+
+        # Gather each cell's live range from the ordered array
+        counts = self.count[cells]
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return self.order[np.repeat(self.start[cells], counts) + offsets]
+
+    def margin(self, point, cx: int, cy: int, r: int):
+        """
+        Distance from a point to the nearest grid cell outside the window of radius r around cell (cx, cy). No
+        unscanned city can be closer than this.
+
+        Args:
+            point: np.array, coordinates of the query point
+            cx: int, column of the center cell
+            cy: int, row of the center cell
+            r: int, window radius in cells
+
+        Returns:
+            float, distance to the outside of the window. inf if the window covers the grid
+        """
+        m = np.inf
+        for axis, c in ((0, cx), (1, cy)):
+            if c - r > 0:
+                m = min(m, point[axis] - (self.lo[axis] + (c - r) * self.cell))
+            if c + r < self.shape[axis] - 1:
+                m = min(m, self.lo[axis] + (c + r + 1) * self.cell - point[axis])
+        return m
+
+    def nearest(self, point):
+        """
+        Nearest live city to a point. Ties are broken by lowest city index.
+
+        Args:
+            point: np.array, coordinates of the query point
+
+        Returns:
+            j: int, index of the nearest live city, -1 if the index is empty
+            d2: float, squared distance to it
+        """
+        if self.size == 0:
+            return -1, np.inf
+        point = np.asarray(point, dtype=np.float64)
+        cx, cy = self.cell_xy(point[None, :])[0]
+        r = 1
+        while True:
+            cand = self.window(cx, cy, r)
+            margin = self.margin(point, cx, cy, r)
+            if len(cand):
+                d2 = ((self.coords[cand] - point) ** 2).sum(axis=1)
+                best = d2.min()
+                # Stop once nothing outside the window can be as close
+                if best < margin ** 2 or margin == np.inf:
+                    j = cand[d2 == best].min()
+                    return int(j), best
+            r *= 2
+
+    def knn(self, k: int):
+        """
+        k nearest live neighbors of every live city, excluding the city itself. Ties are broken by lowest city index.
+
+        Args:
+            k: int, number of neighbors
+
+        Returns:
+            2D np.array of int, row i lists the neighbors of city i by increasing distance, -1 where fewer than k exist
+        """
+        out = np.full((len(self.coords), k), -1, dtype=np.int64)
+        for p in np.flatnonzero(self.alive):
+            point = self.coords[p]
+            cx, cy = self.cell_xy(point[None, :])[0]
+            r = 1
+            while True:
+                cand = self.window(cx, cy, r)
+                cand = cand[cand != p]
+                margin = self.margin(point, cx, cy, r)
+                if len(cand) >= k or margin == np.inf:
+                    d2 = ((self.coords[cand] - point) ** 2).sum(axis=1)
+                    order = np.lexsort((cand, d2))[:k]
+                    # The k-th neighbor must be closer than anything outside the window
+                    if margin == np.inf or d2[order[-1]] < margin ** 2:
+                        out[p, :len(order)] = cand[order]
+                        break
+                r *= 2
+        return out